@@ -1,16 +1,28 @@
-from dash import Dash
-import dash_bootstrap_components as dbc
-from layouts.app_layout import layout_app
-from callbacks.controller_callbacks import register_callbacks
-from source.manager_controller import MangerController
+def create_app():
+    """
+    Builds the Dash app with its `MangerController`. Nothing is built or imported on import of
+    this module, because the spawned worker processes of the job scheduler import it again.
+    """
+    from dash import Dash
+    import dash_bootstrap_components as dbc
+    from layouts.app_layout import layout_app
+    from callbacks.controller_callbacks import register_callbacks
+    from source.manager_controller import MangerController
 
+    app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+    app.layout = layout_app
+    manger_controller = MangerController()
+    register_callbacks(manger_controller)
+    return app
+
+
+def create_server():
+    """
+    WSGI server of the app, e.g. for gunicorn "app:create_server()".
+    """
+    return create_app().server
 
-app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
-server = app.server    
-app.layout = layout_app
-manger_controller = MangerController()
-register_callbacks(manger_controller)
 
 if __name__ == '__main__':
+    app = create_app()
     app.run_server(debug=False)
-    
\ No newline at end of file
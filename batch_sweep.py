@@ -0,0 +1,38 @@
+"""
+Runs sweeps from JSON or YAML spec files without the web app.
+
+Usage:
+    python batch_sweep.py spec.json [more_specs.json ...] [--output-dir DIR] [--workers N]
+
+The spec format is described in `source.batch_runner.load_sweep_specs`.
+Every sweep writes a JSON lines file, which can be read with `source.batch_runner.read_batch_output`.
+"""
+import argparse
+import logging
+import sys
+
+from source.batch_runner import BatchRunner, load_sweep_specs
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Volume hologram sweeps without GUI")
+    parser.add_argument("specs", nargs="+", help="JSON or YAML spec files")
+    parser.add_argument("--output-dir", default=".", help="Directory for output files without explicit path")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes per sweep, default: number of CPUs")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    sweeps = list()
+    for path in args.specs:
+        sweeps += load_sweep_specs(path)
+
+    runner = BatchRunner(args.output_dir, args.workers)
+    outputs = runner.run_all(sweeps)
+    if len(outputs) != len(sweeps):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+Benchmark suite of the rcwa package for a matrix of harmonic orders and numbers of z layers.
+
+Covered functions:
+    - VolumeHologram3D.get_scatter_matrices_of_system (one scatter matrix per layer)
+    - ScatterMatrix.redheffer_star_product
+    - calculate_efficiency_Rs_Rp_Ts_Tp
+    - VolumeHologram3D.calc_rcwa in thickness mode and cycle mode
+    - HOEThicknessDependence.compute_efficiency_per_cycle
+
+Every case is timed with a new hologram and an empty convolution cache, so the cold cost of one
+sweep point is measured. The results are stored as JSON together with the git commit, so runs of
+different commits can be compared. Only public functions are used, so the benchmarks do not 
+depend on internals of the hologram classes.
+
+Run from the repository root:
+    python -m benchmarks.benchmark_suite
+    python -m benchmarks.benchmark_suite --quick --output before.json
+    python -m benchmarks.benchmark_suite --quick --output after.json --compare before.json
+"""
+import numpy as np
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+from timeit import Timer
+from typing import Callable
+
+from rcwa.volume_hologram_3D import VolumeHologram3D
+from rcwa.hoe_thickness_dependence import HOEThicknessDependence
+from rcwa.scatter_matrix import ScatterMatrix
+from rcwa.calculator_diffraction_efficiency import calculate_efficiency_Rs_Rp_Ts_Tp
+
+
+HARMONIC_ORDERS = [1, 2, 5, 10, 20]
+N_Z = [21, 101, 501, 1001]
+QUICK_HARMONIC_ORDERS = [1, 5]
+QUICK_N_Z = [21, 101]
+
+# Thickness of the hologram in the cycle calculations, about 50 grating cycles
+CYCLE_THICKNESS = 20.0
+
+
+def _create_hoe(harmonic_order: int, n_z: int, hoe_type: type = VolumeHologram3D) -> VolumeHologram3D:
+    VolumeHologram3D.convolution_cache.clear()
+    hoe = hoe_type()
+    hoe.harmonic_order = harmonic_order
+    hoe.n_z = n_z
+    return hoe
+
+
+def _setup_get_scatter_matrices_of_system(harmonic_order: int, n_z: int) -> Callable:
+    hoe = _create_hoe(harmonic_order, n_z)
+    def run():
+        VolumeHologram3D.convolution_cache.clear()
+        hoe.get_scatter_matrices_of_system()
+    return run
+
+
+def _setup_redheffer_star_product(harmonic_order: int, n_z: int) -> Callable:
+    hoe = _create_hoe(harmonic_order, 1)
+    scatter_matrices = hoe.get_scatter_matrices_of_system()
+    SA = scatter_matrices[0]
+    SB = scatter_matrices["S_ref"]
+    return lambda: ScatterMatrix.redheffer_star_product(SA, SB)
+
+
+def _setup_calculate_efficiency_Rs_Rp_Ts_Tp(harmonic_order: int, n_z: int) -> Callable:
+    hoe = _create_hoe(harmonic_order, 1)
+    scatter_matrices = hoe.get_scatter_matrices_of_system()
+    S_global = ScatterMatrix.redheffer_star_product(scatter_matrices["S_ref"], scatter_matrices[0])
+    S_global = ScatterMatrix.redheffer_star_product(S_global, scatter_matrices["S_trn"])
+    pram = hoe.rcwa_parameter
+    return lambda: calculate_efficiency_Rs_Rp_Ts_Tp(pram, S_global)
+
+
+def _setup_calc_rcwa_thickness_mode(harmonic_order: int, n_z: int) -> Callable:
+    def run():
+        hoe = _create_hoe(harmonic_order, n_z)
+        hoe.nz_steps_per_cycle = False
+        hoe.calc_rcwa()
+    return run
+
+
+def _setup_calc_rcwa_cycle_mode(harmonic_order: int, n_z: int) -> Callable:
+    def run():
+        hoe = _create_hoe(harmonic_order, n_z)
+        hoe.nz_steps_per_cycle = True
+        hoe.calc_rcwa()
+    return run
+
+
+def _setup_compute_efficiency_per_cycle(harmonic_order: int, n_z: int) -> Callable:
+    def run():
+        hoe = _create_hoe(harmonic_order, n_z, HOEThicknessDependence)
+        hoe.compute_efficiency_per_cycle(CYCLE_THICKNESS)
+    return run
+
+
+# name: (setup, depends on n_z)
+BENCHMARKS: dict[str, tuple[Callable, bool]] = {
+    "get_scatter_matrices_of_system": (_setup_get_scatter_matrices_of_system, True),
+    "redheffer_star_product": (_setup_redheffer_star_product, False),
+    "calculate_efficiency_Rs_Rp_Ts_Tp": (_setup_calculate_efficiency_Rs_Rp_Ts_Tp, False),
+    "calc_rcwa_thickness_mode": (_setup_calc_rcwa_thickness_mode, True),
+    "calc_rcwa_cycle_mode": (_setup_calc_rcwa_cycle_mode, True),
+    "compute_efficiency_per_cycle": (_setup_compute_efficiency_per_cycle, True),
+}
+
+
+def time_function(function: Callable, repeat: int, min_time: float = 0.2) -> list[float]:
+    """
+    Times `function` `repeat` times and returns the durations of one call in seconds.
+    Fast functions are called several times per measurement, so that one measurement
+    takes at least `min_time`.
+    """
+    timer = Timer(function)
+    duration = timer.timeit(1)
+    number = max(1, int(min_time/max(duration, 10E-10)))
+    return [t/number for t in timer.repeat(repeat, number)]
+
+
+def run_benchmark(names: list[str], harmonic_orders: list[int], n_z_values: list[int], repeat: int = 3) -> list[dict]:
+    results = list()
+    for name in names:
+        setup, depends_on_n_z = BENCHMARKS[name]
+        for harmonic_order in harmonic_orders:
+            for n_z in (n_z_values if depends_on_n_z else [None]):
+                function = setup(harmonic_order, n_z)
+                times = time_function(function, repeat)
+                result = dict()
+                result["benchmark"] = name
+                result["harmonic_order"] = harmonic_order
+                result["n_z"] = n_z
+                result["min_ms"] = 1000*min(times)
+                result["median_ms"] = 1000*float(np.median(times))
+                result["repeat"] = repeat
+                results.append(result)
+                print(f"{name:>36} {harmonic_order:>6} {str(n_z):>6} {result['min_ms']:>12.3f}", flush=True)
+    return results
+
+
+def get_metadata() -> dict:
+    metadata = dict()
+    metadata["commit"] = _get_git_commit()
+    metadata["date"] = datetime.datetime.now().isoformat(timespec="seconds")
+    metadata["python"] = platform.python_version()
+    metadata["numpy"] = np.__version__
+    metadata["platform"] = platform.platform()
+    metadata["cpu_count"] = os.cpu_count()
+    return metadata
+
+
+def _get_git_commit() -> str:
+    try:
+        output = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return output.stdout.strip()
+
+
+def _result_key(result: dict) -> tuple:
+    return result["benchmark"], result["harmonic_order"], result["n_z"]
+
+
+def compare_results(results: list[dict], baseline: list[dict], threshold: float) -> int:
+    """
+    Prints the ratio of the minimal times to the baseline. Returns the number of cases that
+    are slower than the baseline by more than the factor `threshold`.
+    """
+    baseline = {_result_key(result): result for result in baseline}
+    regressions = 0
+    print(f"{'benchmark':>36} {'order':>6} {'n_z':>6} {'base [ms]':>12} {'now [ms]':>12} {'ratio':>7}")
+    for result in results:
+        base = baseline.get(_result_key(result))
+        if base is None:
+            continue
+        ratio = result["min_ms"]/base["min_ms"]
+        flag = ""
+        if ratio > threshold:
+            flag = " slower"
+            regressions += 1
+        print(f"{result['benchmark']:>36} {result['harmonic_order']:>6} {str(result['n_z']):>6} {base['min_ms']:>12.3f} {result['min_ms']:>12.3f} {ratio:>7.2f}{flag}")
+    return regressions
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks of the rcwa package, results are stored as JSON.")
+    parser.add_argument("--output", default=None, help="JSON result file, defaults to benchmarks/results/<commit>.json")
+    parser.add_argument("--benchmarks", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--harmonic-orders", nargs="+", type=int, default=None)
+    parser.add_argument("--n-z", nargs="+", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--quick", action="store_true", help=f"Only harmonic orders {QUICK_HARMONIC_ORDERS} and n_z {QUICK_N_Z}")
+    parser.add_argument("--compare", default=None, help="JSON result file of a previous run")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Ratio to the baseline that counts as regression")
+    args = parser.parse_args(argv)
+
+    harmonic_orders = args.harmonic_orders or (QUICK_HARMONIC_ORDERS if args.quick else HARMONIC_ORDERS)
+    n_z_values = args.n_z or (QUICK_N_Z if args.quick else N_Z)
+
+    metadata = get_metadata()
+    print(f"{'benchmark':>36} {'order':>6} {'n_z':>6} {'min [ms]':>12}")
+    results = run_benchmark(args.benchmarks, harmonic_orders, n_z_values, args.repeat)
+
+    output = args.output
+    if output is None:
+        output = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", metadata["commit"]+".json")
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump({"metadata": metadata, "results": results}, file, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare is not None:
+        with open(args.compare, "r") as file:
+            baseline = json.load(file)
+        print(f"Compare with commit {baseline['metadata']['commit']}")
+        regressions = compare_results(results, baseline["results"], args.threshold)
+        return 1 if regressions != 0 else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -8,7 +8,7 @@ from callbacks.logger_callbacks import register_logger_callbacks
 
 from source.app_controller import AppController
 from source.manager_controller import MangerController
-from source.display_controller import build_graph, filter_and_get_pram_variables, build_dummy_graph
+from source.display_controller import build_graph, build_graph_patch, filter_and_get_pram_variables, build_dummy_graph
 from source.parameter_controller import ParameterControl
 
 import layouts.controller_layout as cpram
@@ -120,20 +120,28 @@ def register_controller_callbacks(manager_controller: MangerController):
 
         add_Rs, add_Rp, add_Ts, add_tp, add_es, add_ep = selected_to_bool(inputs[i_checkboxes])
         harmonic = inputs[i_harmonic]
-        data  = app_controller.get_updated_plotting_data_and_status(add_Rs, add_Rp, add_Ts, add_tp, add_es, add_ep, harmonic, 0, ask_for_plot_data)        
+        data  = app_controller.get_incremental_plotting_data_and_status(add_Rs, add_Rp, add_Ts, add_tp, add_es, add_ep, harmonic, 0, ask_for_plot_data)        
         
         if data is None:
             app_controller.logger.debug("Data locked")
             return inputs[:-1]
         
-        is_running, progress, plot_data = data
+        is_running, progress, plot_data, plot_updates = data
                 
-        if is_running:
+        queue_position = app_controller.get_queue_position()
+        if is_running and queue_position:
+            inputs[i_start_stop] = f"Stop (queue {queue_position})"
+        elif is_running:
             inputs[i_start_stop] = "Stop"
         else:
             inputs[i_start_stop] = "Start"
         
         inputs[i_progress] = progress       
+
+        if plot_data is None:
+            # Only the new points of the running simulation are sent to the browser
+            inputs[i_graph] = build_graph_patch(plot_updates)
+            return inputs[:-1]
         
         figure = inputs[i_graph]
         
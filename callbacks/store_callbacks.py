@@ -32,11 +32,11 @@ def register_store_callbacks(manager_controller: MangerController):
             raise PreventUpdate()
         store_controller = app_controller.store_controller        
 
-        json_data_list = store_controller.get_json_data()
+        npz_data_list = store_controller.get_npz_data()
         buffer = io.BytesIO()
         with zipfile.ZipFile(buffer, "w") as zip_file:
-            for item in json_data_list.items():
-                zip_file.writestr(item[0]+".json", item[1])
+            for item in npz_data_list.items():
+                zip_file.writestr(item[0]+".npz", item[1])
         
         buffer.seek(0)
         return [dcc.send_bytes(buffer.getvalue(), "hoe_simulations.zip")]
@@ -65,14 +65,24 @@ def register_store_callbacks(manager_controller: MangerController):
         content_type, content_string = contents.split(",")
         decoded = base64.b64decode(content_string)
         try:
-            with zipfile.ZipFile(io.BytesIO(decoded), "r") as zip_file:
-                files = zip_file.namelist()
-                for file in files:
-                    if file.endswith(".json"):
-                        with zip_file.open(file) as f:
-                            data_dict = json.load(f)    
-                            data = DataContainer.from_dict(data_dict)
-                            name = file[:-5]
+            if DataContainer.is_npz(decoded):
+                # A single simulation, not packed in a zip file
+                data = DataContainer.from_npz(decoded)
+                store_controller.add_simulation(data.name, data)
+            else:
+                # zip file with .npz files or .json files of older versions
+                with zipfile.ZipFile(io.BytesIO(decoded), "r") as zip_file:
+                    files = zip_file.namelist()
+                    for file in files:
+                        if file.endswith(".json"):
+                            with zip_file.open(file) as f:
+                                data_dict = json.load(f)    
+                                data = DataContainer.from_dict(data_dict)
+                                name = file[:-5]
+                                store_controller.add_simulation(name, data)
+                        elif file.endswith(".npz"):
+                            data = DataContainer.from_npz(zip_file.read(file))
+                            name = file[:-4]
                             store_controller.add_simulation(name, data)
         except:
             app_controller.logger.warning("Couldn't read data")
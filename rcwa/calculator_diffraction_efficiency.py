@@ -1,10 +1,10 @@
 import numpy as np
-from numpy.linalg import inv
 from typing import Optional
 
 from rcwa.scatter_matrix import ScatterMatrix
 from rcwa.parameter import Parameter
-from rcwa.rcwa_help_function import build_kz_norm_ref_trn, build_kxy_norm, build_pq_grid
+from rcwa.stage_timing import stage
+from rcwa.rcwa_help_function import build_kz_norm_ref_trn_vectors, build_kxy_norm_vectors, build_pq_grid
 
 
 def calculate_efficiency_Rs_Rp_Ts_Tp(pram: Parameter, S_global: ScatterMatrix) -> tuple[np.ndarray]:
@@ -32,34 +32,76 @@ def calculate_efficiency_Rs_Rp_Ts_Tp(pram: Parameter, S_global: ScatterMatrix) -
         - Tp : np.ndarray
             2D array representing the transmission efficiency for P-polarization (in percentage).
     """        
-    calculator = _CalculatorDiffractionEfficiency(pram, S_global)
+    columns = get_incident_columns(pram)
+    S11_columns = S_global.S11[:, columns]
+    S21_columns = S_global.S21[:, columns]
+    return calculate_efficiency_from_columns(pram, S11_columns, S21_columns)
+
+
+@stage("efficiency")
+def calculate_efficiency_from_columns(pram: Parameter, S11_columns: np.ndarray, S21_columns: np.ndarray) -> tuple[np.ndarray]:
+    """
+    Computes the diffraction efficiency from the two columns of S_global.S11 and S_global.S21 
+    that are excited by the incident wave, see `get_incident_columns`.
+
+    Parameters:
+    -----------
+    pram : Parameter
+        An instance of the Parameter class containing the system's physical properties.
+    S11_columns : np.ndarray
+        Columns of S_global.S11, shape (2N, 2).
+    S21_columns : np.ndarray
+        Columns of S_global.S21, shape (2N, 2).
+
+    Returns:
+    --------
+    tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+        Rs, Rp, Ts, Tp as in `calculate_efficiency_Rs_Rp_Ts_Tp`.
+    """
+    calculator = _CalculatorDiffractionEfficiency(pram, S11_columns, S21_columns)
     calculator.calc_efficiency()
     return calculator.Rs, calculator.Rp, calculator.Ts, calculator.Tp
 
 
+def get_incident_columns(pram: Parameter) -> list[int]:
+    """
+    Indices of the columns of S11 and S21 that belong to the x and y component of the zeroth order.
+    """
+    dim = pram.dim_scattering_matrix_Sij//2
+    i_x = int((dim-1)/2)
+    i_y = i_x + dim
+    return [i_x, i_y]
+
+
 class _CalculatorDiffractionEfficiency:
 
-    def __init__(self, pram: Parameter, S_global: ScatterMatrix):
+    def __init__(self, pram: Parameter, S11_columns: np.ndarray, S21_columns: np.ndarray):
         self.pram: Parameter = pram
-        self.S_global: ScatterMatrix = S_global
+        self.S11_columns: np.ndarray = S11_columns
+        self.S21_columns: np.ndarray = S21_columns
 
         self.Rs: Optional[np.ndarray] = None
         self.Rp: Optional[np.ndarray] = None
         self.Ts: Optional[np.ndarray] = None
         self.Tp: Optional[np.ndarray] = None
 
-        kzn_ref, kzn_trn = build_kz_norm_ref_trn(pram)
+        # diagonals only
+        kz_ref, kz_trn = build_kz_norm_ref_trn_vectors(pram)
+        kx, ky = build_kxy_norm_vectors(pram)
 
-        self.kzn_ref: np.ndarray = kzn_ref 
-        self.kzn_trn: np.ndarray = kzn_trn 
+        self.kz_ref: np.ndarray = kz_ref 
+        self.kz_trn: np.ndarray = kz_trn 
+        self.kx: np.ndarray = kx
+        self.ky: np.ndarray = ky
     
     def calc_efficiency(self) -> None:
         # sx_i, sy_i are the incident electric field for i = S,P 
         sx_s, sy_s = self._calc_sx_sy_for_s_pol()
         sx_p, sy_p = self._calc_sx_sy_for_p_pol()
-        Rs_vec, Ts_vec = self._calc_efficiency(sx_s, sy_s)
-        Rp_vec, Tp_vec = self._calc_efficiency(sx_p, sy_p)
-        self._reshape_ref_trn_into_grid( Rs_vec, Rp_vec, Ts_vec, Tp_vec)
+        # columns: s and p polarization
+        s_inc = np.array([[sx_s, sx_p], [sy_s, sy_p]], dtype=Parameter.dtype)
+        R, T = self._calc_efficiency(s_inc)
+        self._reshape_ref_trn_into_grid(R[:,0], R[:,1], T[:,0], T[:,1])
 
     def _reshape_ref_trn_into_grid(self, Rs_vec, Rp_vec, Ts_vec, Tp_vec) -> None:
         grid_p, grid_q = build_pq_grid(self.pram)
@@ -70,46 +112,37 @@ class _CalculatorDiffractionEfficiency:
         self.Ts = 100*Ts_vec.reshape(shape)
         self.Tp = 100*Tp_vec.reshape(shape)
 
-    def _calc_efficiency(self, sx: np.ndarray, sy: np.ndarray) -> tuple[np.ndarray]:
-        kxn, kyn = build_kxy_norm(self.pram)
-        dim = kxn.shape[0]
-        i_x = int((dim-1)/2)
-        i_y = i_x + dim
-        S = self.S_global                
-
-        c_inc = np.zeros((2*dim,1) , dtype=Parameter.dtype)
-        c_inc[i_x] = sx
-        c_inc[i_y] = sy
+    def _calc_efficiency(self, s_inc: np.ndarray) -> tuple[np.ndarray]:
+        dim = self.kx.shape[0]
 
-        c_ref = S.S11 @ c_inc
-        c_trn = S.S21 @ c_inc
+        c_ref = self.S11_columns @ s_inc
+        c_trn = self.S21_columns @ s_inc
 
-        rx = c_ref[:dim,0]
-        ry = c_ref[dim:,0]
+        rx = c_ref[:dim]
+        ry = c_ref[dim:]
 
-        tx = c_trn[:dim,0]
-        ty = c_trn[dim:,0]
+        tx = c_trn[:dim]
+        ty = c_trn[dim:]
 
-        kzn_ref = self.kzn_ref
-        kzn_trn = self.kzn_trn
+        kx = self.kx[:, np.newaxis]
+        ky = self.ky[:, np.newaxis]
+        kz_ref = self.kz_ref[:, np.newaxis]
+        kz_trn = self.kz_trn[:, np.newaxis]
 
-        rz = -inv(kzn_ref) @ ( (kxn @ rx) + (kyn @ ry) )
-        tz = -inv(kzn_trn) @ ( (kxn @ tx) + (kyn @ ty) )
+        rz = -((kx*rx) + (ky*ry))/kz_ref
+        tz = -((kx*tx) + (ky*ty))/kz_trn
 
         R_temp = np.abs(rx)**2 + np.abs(ry)**2 + np.abs(rz)**2
         T_temp = np.abs(tx)**2 + np.abs(ty)**2 + np.abs(tz)**2
 
-        up = -(kzn_ref/self.pram.ur_ref).real
         kzn_inc = self.pram.kz_inc/self.pram.k0 
         down = (kzn_inc/self.pram.ur_ref).real
-        pre = up/down
-        R = pre @ R_temp
 
-        up = (kzn_trn/self.pram.ur_trn).real
-        kzn_inc = self.pram.kz_inc/self.pram.k0 
-        down = (kzn_inc/self.pram.ur_ref).real
-        pre = up/down
-        T = pre @ T_temp
+        up = -(kz_ref/self.pram.ur_ref).real
+        R = (up/down)*R_temp
+
+        up = (kz_trn/self.pram.ur_trn).real
+        T = (up/down)*T_temp
         return R, T
    
     def _rot_matrix_z(self) -> np.ndarray:
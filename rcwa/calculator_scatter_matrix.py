@@ -1,16 +1,16 @@
 import numpy as np
-from typing import Union, Optional, Hashable
+from typing import Union, Optional, Hashable, Iterable
 
-from numpy.fft import fft2, fftshift
+from numpy.fft import fft, fft2, fftshift
 from numpy.linalg import inv
-from scipy.linalg import expm
 
 from rcwa.parameter import Parameter
 from rcwa.layer_data import LayerData
 from rcwa.scatter_matrix import ScatterMatrix
-from rcwa.rcwa_help_function import build_pq_grid, build_kxy_norm
+from rcwa.stage_timing import stage
+from rcwa.rcwa_help_function import build_pq_grid, build_kxy_norm_vectors
 
-from rcwa.rcwa_exception import RCWAError
+from rcwa.rcwa_exception import RCWAError, RCWAWrongParameterError
 
 
 def calc_all_scatter_matrices_of_system(pram: Parameter) -> dict[Hashable, ScatterMatrix]:
@@ -53,6 +53,264 @@ def calc_all_scatter_matrices_of_system(pram: Parameter) -> dict[Hashable, Scatt
     return scatter_matrices_of_system
 
 
+def calc_scatter_matrices_of_phase_shifted_layers(pram: Parameter, convolution: "LayerStackConvolution", Li: float, phase_shifts: np.ndarray, identifiers: Iterable[Hashable]) -> dict[Hashable, ScatterMatrix]:
+    """
+    Computes the scatter matrices of layers that are copies of one layer, shifted along the grating.
+
+    If the er/ur spectrum of layer l is the spectrum of the first layer multiplied by exp(i*p*phase_l) 
+    for harmonic p, the convolution matrices are the diagonal similarity transforms 
+    D_l @ C @ D_l^-1 with D_l = diag(exp(i*p*phase_l)). Because kxn, kyn, V0 and W0 are diagonal
+    in the harmonics, the eigenvectors follow as W_l = D_l @ W, V_l = D_l @ V, the eigenvalues 
+    are unchanged and the scatter matrix is S_l = D_l @ S @ D_l^-1.
+    The eigenproblem is therefore only solved once.
+
+    Parameters:
+    -----------
+    pram : Parameter
+        An instance of the `Parameter` class containing all system parameters.
+    convolution : LayerStackConvolution
+        Convolution matrices of the unshifted layer (stack with one layer).
+    Li : float
+        Thickness of every layer.
+    phase_shifts : np.ndarray
+        Phase of the first harmonic in x-direction for every layer.
+    identifiers : Iterable[Hashable]
+        Identifier for every layer, same length as `phase_shifts`.
+
+    Returns:
+    --------
+    dict[Hashable, ScatterMatrix]
+        A dictionary with the scatter matrix for every identifier.
+    """
+    system_data = _ScatterMatrixSystemData(pram)
+    V0, W0 = _eigen_vectors_vacuum_V0_W0(system_data)
+    S11, S12 = _scatter_blocks_of_convolution_stack(system_data, convolution, Li, V0, W0)
+    S = ScatterMatrix()
+    S.S11 = S11[0]
+    S.S12 = S12[0]
+
+    ps = system_data.grid_p.flatten()
+    ps = np.concatenate((ps, ps))
+    scatter_matrices = dict()
+    for phase, identifier in zip(phase_shifts, identifiers):
+        d = np.exp(1j*ps*phase)
+        scatter_matrices[identifier] = _phase_shift_scatter_matrix(S, d)
+    return scatter_matrices
+
+
+def calc_scatter_matrices_of_layer_stack(pram: Parameter, convolution: "LayerStackConvolution", Li: Union[float, np.ndarray], identifiers: Iterable[Hashable]) -> dict[Hashable, ScatterMatrix]:
+    """
+    Computes the scatter matrices of a stack of layers in one batched pass.
+
+    P/Q assembly, eigen decomposition and the scatter matrix build run on
+    (L, 2N, 2N) stacks with the broadcasting routines of numpy.linalg instead of one 
+    `_EigenValuesVectors` per layer.
+
+    Parameters:
+    -----------
+    pram : Parameter
+        An instance of the `Parameter` class containing all system parameters.
+    convolution : LayerStackConvolution
+        Convolution matrices of the layers, see `build_layer_stack_convolution`.
+    Li : float or np.ndarray
+        Thickness of all layers or of every layer (shape (L,)).
+    identifiers : Iterable[Hashable]
+        Identifier for every layer.
+
+    Returns:
+    --------
+    dict[Hashable, ScatterMatrix]
+        A dictionary with the scatter matrix for every identifier.
+    """
+    system_data = _ScatterMatrixSystemData(pram)
+    V0, W0 = _eigen_vectors_vacuum_V0_W0(system_data)
+    S11, S12 = _scatter_blocks_of_convolution_stack(system_data, convolution, Li, V0, W0)
+    scatter_matrices = dict()
+    for i, identifier in enumerate(identifiers):
+        S = ScatterMatrix()
+        S.S11 = S11[i]
+        S.S12 = S12[i]
+        S.S22 = S.S11
+        S.S21 = S.S12
+        scatter_matrices[identifier] = S
+    return scatter_matrices
+
+
+def build_layer_stack_convolution(pram: Parameter, er: Union[complex, np.ndarray], ur: Union[complex, np.ndarray], is_spectrum: bool = False) -> "LayerStackConvolution":
+    """
+    Builds the convolution matrices of a stack of layers and their inverses.
+
+    The result only depends on er, ur and the harmonic orders, not on the incident wave, 
+    so it can be reused for different angles and wavelengths.
+
+    Parameters:
+    -----------
+    pram : Parameter
+        An instance of the `Parameter` class, only the harmonic orders are used.
+    er, ur : complex or np.ndarray
+        Homogeneous value or stack of shape (L, ny, nx) of the layers. 
+        At least one of them must be a stack.
+    is_spectrum : bool, optional
+        If True, the stacks hold the centered Fourier coefficients instead of sampled values.
+
+    Returns:
+    --------
+    LayerStackConvolution
+    """
+    system_data = _ScatterMatrixSystemData(pram)
+    erc = _build_convolution_matrix_stack(er, system_data, is_spectrum)
+    urc = _build_convolution_matrix_stack(ur, system_data, is_spectrum)
+    return LayerStackConvolution(erc, urc)
+
+
+class LayerStackConvolution:
+    """
+    Convolution matrices of er and ur of a stack of layers and their inverses.
+
+    Homogeneous er or ur are stored with a single layer (shape (1, N, N)) and broadcast.
+    """
+
+    def __init__(self, erc: np.ndarray, urc: np.ndarray, erc_inv: Optional[np.ndarray] = None, urc_inv: Optional[np.ndarray] = None):
+        self.erc: np.ndarray = erc
+        self.urc: np.ndarray = urc
+        self.erc_inv: np.ndarray = inv(erc) if erc_inv is None else erc_inv
+        self.urc_inv: np.ndarray = inv(urc) if urc_inv is None else urc_inv
+
+    def get_layer(self, i: int) -> "LayerStackConvolution":
+        """
+        Convolution of layer `i` as a stack with one layer, the data are shared.
+        """
+        def take(a: np.ndarray) -> np.ndarray:
+            return a if a.shape[0] == 1 else a[i:i+1]
+        return LayerStackConvolution(take(self.erc), take(self.urc), take(self.erc_inv), take(self.urc_inv))
+
+    @property
+    def n_layers(self) -> int:
+        return max(self.erc.shape[0], self.urc.shape[0])
+
+    @property
+    def nbytes(self) -> int:
+        return self.erc.nbytes + self.urc.nbytes + self.erc_inv.nbytes + self.urc_inv.nbytes
+
+
+@stage("convolution")
+def build_convolution_matrices(e_or_mu: np.ndarray, system_data: "_ScatterMatrixSystemData", is_spectrum: bool = False) -> np.ndarray:
+    """
+    Builds the convolution matrices of one or several sampled er/ur slices.
+
+    All (p-p', q-q') entries are gathered from the centered FFT spectrum in a single
+    fancy-indexing step.
+
+    Parameters:
+    -----------
+    e_or_mu : np.ndarray
+        One slice of shape (ny, nx) or a stack of slices of shape (n_layers, ny, nx).
+        nx and ny must be odd, ny = 1 for gratings without modulation in y-direction.
+    system_data : _ScatterMatrixSystemData
+        Precomputed system data providing the harmonic grid.
+    is_spectrum : bool, optional
+        If True, `e_or_mu` already holds the centered Fourier coefficients
+        (as returned by fftshift(fft2(x))/x.size) and the FFT is skipped.
+
+    Returns:
+    --------
+    np.ndarray
+        Convolution matrix of shape (N, N) for a single slice or (n_layers, N, N) for a stack.
+    """
+    stack = np.asarray(e_or_mu)
+    single = stack.ndim == 2
+    if single:
+        stack = stack[np.newaxis, :, :]
+    if is_spectrum:
+        spec = stack
+    elif stack.shape[1] == 1:
+        # y-invariant slices, only the 1-D FFT in x is needed
+        dim = stack.shape[2]
+        spec = fftshift(fft(stack, axis=-1), axes=-1)/dim
+    else:
+        dim = stack.shape[1]*stack.shape[2]
+        spec = fftshift(fft2(stack, axes=(-2, -1)), axes=(-2, -1))/dim
+    iy, ix = system_data.get_convolution_index(spec.shape[1:])
+    convolution_matrices = spec[:, iy, ix].astype(system_data.pram.dtype, copy=False)
+    if single:
+        return convolution_matrices[0]
+    return convolution_matrices
+
+
+def _build_convolution_matrix_stack(e_or_mu: Union[complex, np.ndarray], system_data: "_ScatterMatrixSystemData", is_spectrum: bool) -> np.ndarray:
+    if type(e_or_mu) is not np.ndarray:
+        dim = len(system_data.kx)
+        return (np.eye(dim, dtype=system_data.pram.dtype)*e_or_mu)[np.newaxis, :, :]
+    return build_convolution_matrices(e_or_mu, system_data, is_spectrum)
+
+
+def _scatter_blocks_of_convolution_stack(system_data: "_ScatterMatrixSystemData", convolution: LayerStackConvolution, Li: Union[float, np.ndarray], V0: np.ndarray, W0: np.ndarray) -> tuple[np.ndarray]:
+    """
+    Computes S11 = S22 and S12 = S21 for all layers of the stack, shape (L, 2N, 2N).
+    """
+    erc = convolution.erc
+    urc = convolution.urc
+    erc_inv = convolution.erc_inv
+    urc_inv = convolution.urc_inv
+    n_layers = convolution.n_layers
+
+    # kxn and kyn are diagonal: kxn @ M @ kyn = kx[:, None]*M*ky[None, :]
+    kx = system_data.kx
+    ky = system_data.ky
+    kx_col = kx[:, np.newaxis]
+    ky_col = ky[:, np.newaxis]
+    kx_row = kx[np.newaxis, :]
+    ky_row = ky[np.newaxis, :]
+
+    q00 = np.broadcast_to(kx_col*urc_inv*ky_row, (n_layers,)+urc_inv.shape[1:])
+    q01 = erc - (kx_col*urc_inv*kx_row)
+    q10 = (ky_col*urc_inv*ky_row) - erc
+    q11 = np.broadcast_to(-ky_col*urc_inv*kx_row, (n_layers,)+urc_inv.shape[1:])
+
+    p00 = np.broadcast_to(kx_col*erc_inv*ky_row, (n_layers,)+erc_inv.shape[1:])
+    p01 = urc - (kx_col*erc_inv*kx_row)
+    p10 = (ky_col*erc_inv*ky_row) - urc
+    p11 = np.broadcast_to(-ky_col*erc_inv*kx_row, (n_layers,)+erc_inv.shape[1:])
+
+    Q = _combine_matrix(q00, q01, q10, q11)
+    P = _combine_matrix(p00, p01, p10, p11)
+
+    if system_data.is_te_tm_decoupled:
+        eigenvalues, W = _eig_te_tm_decoupled(P, Q)
+    else:
+        eigenvalues, W = _eig(P @ Q)
+    Lam = np.sqrt(eigenvalues)
+    if np.any(Lam == 0):
+        raise RCWAError("Eigenvalue is zero", "Change incident angle or grating")
+    V = (Q @ W)/Lam[:, np.newaxis, :]
+    Li = np.broadcast_to(np.asarray(Li, dtype=float), (n_layers,))
+    arg = -Lam*system_data.pram.k0*Li[:, np.newaxis]
+
+    return _scatter_blocks_inside_vacuum(W, V, arg, V0, W0)
+
+
+@stage("eig")
+def _eig(Omega2: np.ndarray) -> tuple[np.ndarray]:
+    return np.linalg.eig(Omega2)
+
+
+def _eig_te_tm_decoupled(P: np.ndarray, Q: np.ndarray) -> tuple[np.ndarray]:
+    """
+    Eigen decomposition of Omega2 = P @ Q for ky = 0 in all harmonics. 
+
+    The diagonal blocks of P and Q vanish, so Omega2 is block diagonal with 
+    P01 @ Q10 and P10 @ Q01 and the two N x N eigenproblems are solved separately 
+    instead of one 2N x 2N problem. Works for single matrices and stacks.
+    """
+    dim = P.shape[-1]//2
+    eigenvalues_a, Wa = _eig(P[..., :dim, dim:] @ Q[..., dim:, :dim])
+    eigenvalues_b, Wb = _eig(P[..., dim:, :dim] @ Q[..., :dim, dim:])
+    zeros = np.zeros(Wa.shape, dtype=Wa.dtype)
+    W = _combine_matrix(Wa, zeros, zeros, Wb)
+    eigenvalues = np.concatenate((eigenvalues_a, eigenvalues_b), axis=-1)
+    return eigenvalues, W
+
+
 class _ScatterMatrixSystemData:
     """
     Internal class that stores precomputed system data for scatter matrix calculations.
@@ -64,10 +322,40 @@ class _ScatterMatrixSystemData:
         self.grid_p: Optional[np.ndarray] = None
         self.grid_q: Optional[np.ndarray] = None
 
-        self.kxn: Optional[np.ndarray] = None
-        self.kyn: Optional[np.ndarray] = None
+        self.kx: Optional[np.ndarray] = None
+        self.ky: Optional[np.ndarray] = None
+        self._convolution_index: dict[tuple[int], tuple[np.ndarray]] = dict()
         self._fill_data()
 
+    @property
+    def is_te_tm_decoupled(self) -> bool:
+        """
+        True if ky vanishes for all harmonics (plane of incidence perpendicular to the grating lines),
+        then the x- and y-polarized fields decouple.
+        """
+        return bool(np.all(np.abs(self.ky) < 10E-12))
+
+    def get_convolution_index(self, shape: tuple[int]) -> tuple[np.ndarray]:
+        """
+        Index arrays (iy, ix) into a centered spectrum of the given shape, so that
+        spectrum[iy, ix] is the (p-p', q-q') Toeplitz convolution matrix.
+        """
+        index = self._convolution_index.get(shape)
+        if index is not None:
+            return index
+        pram = self.pram
+        my = int((shape[0]-1)/2)
+        mx = int((shape[1]-1)/2)
+        if (2*pram.harmonic_order_y > my) or (2*pram.harmonic_order_x > mx):
+            raise RCWAWrongParameterError("Harmonic order too high for the sampling of er and ur", "Decrease harmonic order or increase nx and ny")
+        ps = self.grid_p.flatten().astype(int)
+        qs = self.grid_q.flatten().astype(int)
+        iy = my + qs[:, np.newaxis] - qs[np.newaxis, :]
+        ix = mx + ps[:, np.newaxis] - ps[np.newaxis, :]
+        index = (iy, ix)
+        self._convolution_index[shape] = index
+        return index
+
     def _fill_data(self):
         pram = self.pram
         
@@ -75,9 +363,9 @@ class _ScatterMatrixSystemData:
         self.grid_p: np.ndarray = grid_p
         self.grid_q: np.ndarray = grid_q
 
-        kxn, kyn = build_kxy_norm(pram)
-        self.kxn: np.ndarray = kxn
-        self.kyn: np.ndarray = kyn
+        kx, ky = build_kxy_norm_vectors(pram)
+        self.kx: np.ndarray = kx
+        self.ky: np.ndarray = ky
                 
 
 class _EigenValuesVectors:
@@ -90,6 +378,7 @@ class _EigenValuesVectors:
         self.er: Union[np.complex_, np.ndarray] = data.er
         self.ur: Union[np.complex_, np.ndarray] = data.ur
         self.Li:float = data.Li
+        self.is_spectrum: bool = data.is_spectrum
         
         self.erc: Optional[np.ndarray] = None
         self.urc: Optional[np.ndarray] = None
@@ -104,10 +393,17 @@ class _EigenValuesVectors:
         self.arg: Optional[np.ndarray] = None
 
     def build_me(self) -> None:        
+        if self.is_homogeneous:
+            self._build_homogeneous()
+            return
         self._build_convolution_matrices()        
         self._build_Q_P_Omega2()        
         self._build_V_W_Lam()
 
+    @property
+    def is_homogeneous(self) -> bool:
+        return (type(self.er) is not np.ndarray) and (type(self.ur) is not np.ndarray)
+
     def _build_convolution_matrices(self) -> None:
         self.erc = self._build_convolution_matrix_from_er_ur(self.er)
         self.urc = self._build_convolution_matrix_from_er_ur(self.ur)
@@ -115,48 +411,34 @@ class _EigenValuesVectors:
     def _build_convolution_matrix_from_er_ur(self,e_or_mu) -> np.ndarray:
         system_data = self.system_data
         if type(e_or_mu) is not np.ndarray:
-            return np.eye(system_data.kxn.shape[0], dtype=system_data.pram.dtype)*e_or_mu
-        dim = e_or_mu.shape[0]*e_or_mu.shape[1]
-        spec = fftshift(fft2(e_or_mu))/dim
-        ps = system_data.grid_p.flatten()
-        qs = system_data.grid_q.flatten()
-        total = len(ps)
-        convolution_matrix = np.zeros((total, total), dtype=system_data.pram.dtype)
-        for n in range(total):
-            p = ps[n]
-            q = qs[n]
-            vec = self._get_row_from_spectrum_for_convolution(spec, p, q)
-            convolution_matrix[n, :] = vec
-        return convolution_matrix
-
-    def _get_row_from_spectrum_for_convolution(self, spectrum: np.ndarray, p:int, q:int) -> np.ndarray:
-            system_data = self.system_data
-            shape = spectrum.shape
-            mx = int((shape[1]-1)/2)
-            my = int((shape[0]-1)/2)
-
-            sy = int(my+ q - system_data.pram.harmonic_order_y)
-            sx = int(mx+ p - system_data.pram.harmonic_order_x)
-
-            ey = int(my+ q + system_data.pram.harmonic_order_y+1)
-            ex = int(mx+ p + system_data.pram.harmonic_order_x+1)
-
-            return spectrum[sy:ey, sx:ex].flatten()[::-1]
+            return np.eye(len(system_data.kx), dtype=system_data.pram.dtype)*e_or_mu
+        return build_convolution_matrices(e_or_mu, system_data, self.is_spectrum)
+
+    def _inv_convolution_matrix(self, e_or_mu, convolution_matrix: np.ndarray) -> np.ndarray:
+        if type(e_or_mu) is not np.ndarray:
+            return np.eye(convolution_matrix.shape[0], dtype=Parameter.dtype)/e_or_mu
+        return inv(convolution_matrix)
 
     def _build_Q_P_Omega2(self) -> None:
         system_data = self.system_data
-        erc_inv = inv(self.erc)
-        urc_inv = inv(self.urc)
+        erc_inv = self._inv_convolution_matrix(self.er, self.erc)
+        urc_inv = self._inv_convolution_matrix(self.ur, self.urc)
+
+        # kxn and kyn are diagonal: kxn @ M @ kyn = kx[:, None]*M*ky[None, :]
+        kx_col = system_data.kx[:, np.newaxis]
+        ky_col = system_data.ky[:, np.newaxis]
+        kx_row = system_data.kx[np.newaxis, :]
+        ky_row = system_data.ky[np.newaxis, :]
         
-        q00 = system_data.kxn @ urc_inv @ system_data.kyn
-        q01 = self.erc - (system_data.kxn @ urc_inv @ system_data.kxn)
-        q10 = (system_data.kyn @ urc_inv @ system_data.kyn) - self.erc
-        q11 = -system_data.kyn @ urc_inv @ system_data.kxn
+        q00 = kx_col*urc_inv*ky_row
+        q01 = self.erc - (kx_col*urc_inv*kx_row)
+        q10 = (ky_col*urc_inv*ky_row) - self.erc
+        q11 = -ky_col*urc_inv*kx_row
 
-        p00 = system_data.kxn @ erc_inv @ system_data.kyn
-        p01 = self.urc - (system_data.kxn @ erc_inv @ system_data.kxn)
-        p10 = (system_data.kyn @ erc_inv @ system_data.kyn) - self.urc
-        p11 = -system_data.kyn @ erc_inv @ system_data.kxn
+        p00 = kx_col*erc_inv*ky_row
+        p01 = self.urc - (kx_col*erc_inv*kx_row)
+        p10 = (ky_col*erc_inv*ky_row) - self.urc
+        p11 = -ky_col*erc_inv*kx_row
 
         Q = _combine_matrix(q00, q01, q10, q11) 
         P = _combine_matrix(p00, p01, p10, p11)
@@ -165,6 +447,44 @@ class _EigenValuesVectors:
         self.Q = Q
         self.P = P
         self.Omega2 = Omega2
+
+    def _build_homogeneous(self) -> None:
+        """
+        Closed form for homogeneous layers (vacuum, ref, trn, ar).
+        All blocks of P and Q are diagonal, Omega2 = P @ Q is diagonal with 
+        kx**2 + ky**2 - er*ur, so W is the identity and no inv or eig is needed.
+        """
+        kx = self.system_data.kx
+        ky = self.system_data.ky
+        er = self.er
+        ur = self.ur
+
+        q00 = kx*ky/ur
+        q01 = er - (kx*kx/ur)
+        q10 = (ky*ky/ur) - er
+        q11 = -ky*kx/ur
+
+        p00 = kx*ky/er
+        p01 = ur - (kx*kx/er)
+        p10 = (ky*ky/er) - ur
+        p11 = -ky*kx/er
+
+        self.Q = _combine_matrix(np.diag(q00), np.diag(q01), np.diag(q10), np.diag(q11))
+        self.P = _combine_matrix(np.diag(p00), np.diag(p01), np.diag(p10), np.diag(p11))
+
+        eigenvalues_half = kx**2 + ky**2 - er*ur
+        # adding +0j clears a signed zero in the imaginary part (as the matrix product P @ Q does), 
+        # so the square root of a propagating order is +i*|kz| like in the general path 
+        eigenvalues = np.concatenate((eigenvalues_half, eigenvalues_half)).astype(Parameter.dtype) + 0j
+        if np.any(np.abs(eigenvalues) < 10E-9):
+            raise RCWAError("KZ is zero", "Change incident angle or grating")
+        self.Omega2 = np.diag(eigenvalues)
+
+        Lam = np.sqrt(eigenvalues)
+        self.W = np.eye(len(eigenvalues), dtype=Parameter.dtype)
+        self.V = self.Q/Lam[np.newaxis, :]
+        self.Lam = Lam
+        self.arg = -Lam*self.system_data.pram.k0*self.Li
         
     def _build_V_W_Lam(self) -> None:
         dia = np.diagonal(self.Omega2)    
@@ -179,13 +499,15 @@ class _EigenValuesVectors:
             if zero:
                 raise RCWAError("KZ is zero", "Change incident angle or grating")
             W = np.eye(dim, dtype=Parameter.dtype)             
+        elif self.system_data.is_te_tm_decoupled:
+            eigenvalues, W = _eig_te_tm_decoupled(self.P, self.Q)
         else:
-            eigenvalues, W = np.linalg.eig(self.Omega2)
-        lam_dia = np.sqrt(eigenvalues)
-        Lam = np.zeros((dim, dim), dtype=Parameter.dtype)
-        np.fill_diagonal(Lam, lam_dia)
-        Lam_inv = inv(Lam)
-        V = self.Q @ W @ Lam_inv
+            eigenvalues, W = _eig(self.Omega2)
+        # Lam and arg are kept as 1-D vectors of the diagonal
+        Lam = np.sqrt(eigenvalues)
+        if np.any(Lam == 0):
+            raise RCWAError("Eigenvalue is zero", "Change incident angle or grating")
+        V = (self.Q @ W)/Lam[np.newaxis, :]
 
         self.W = W
         self.V = V
@@ -199,11 +521,21 @@ def _build_scatter_matrix_inside_vacuum(eigen: _EigenValuesVectors, V0:np.ndarra
     """
     Computes the scatter matrix for a layer inside a vacuum.
     """
-    Wi = eigen.W
-    Vi = eigen.V
-    Li = eigen.Li
-    arg = eigen.arg
+    S11, S12 = _scatter_blocks_inside_vacuum(eigen.W, eigen.V, eigen.arg, V0, W0)
+    S = ScatterMatrix()
+    S.S11 = S11
+    S.S12 = S12
+    S.S22 = S11
+    S.S21 = S12
+    return S
+     
 
+@stage("layer_scatter_matrix")
+def _scatter_blocks_inside_vacuum(Wi: np.ndarray, Vi: np.ndarray, arg: np.ndarray, V0: np.ndarray, W0: np.ndarray) -> tuple[np.ndarray]:
+    """
+    Computes S11 = S22 and S12 = S21 of a layer inside vacuum. 
+    Works on a single layer (2N, 2N) or on a stack of layers (L, 2N, 2N), arg has the shape (..., 2N).
+    """
     Wi_inv = inv(Wi)
     Vi_inv = inv(Vi)
 
@@ -211,21 +543,32 @@ def _build_scatter_matrix_inside_vacuum(eigen: _EigenValuesVectors, V0:np.ndarra
     B = (Wi_inv @ W0) - (Vi_inv @ V0)
     A_inv = inv(A)
 
-    X = expm(arg)
+    # X = expm(diag(arg)) is diagonal, products with X are row or column scalings
+    X = np.exp(arg)
+    XB = X[..., :, np.newaxis]*B
+    XBA_invX = (XB @ A_inv)*X[..., np.newaxis, :]
 
-    Mul = inv(A - (X @ B @ A_inv @ X @ B))
-    S11_Second = (X @ B @ A_inv @ X @ A) - B
-    S12_Second = X @ (A - (B @ A_inv @ B) )
+    Mul = A - (XBA_invX @ B)
+    S11_Second = (XBA_invX @ A) - B
+    S12_Second = X[..., :, np.newaxis]*(A - (B @ A_inv @ B))
+
+    dim = A.shape[-1]
+    S11_S12 = np.linalg.solve(Mul, np.concatenate((S11_Second, S12_Second), axis=-1))
+    return S11_S12[..., :dim], S11_S12[..., dim:]
+
+
+def _phase_shift_scatter_matrix(S: ScatterMatrix, d: np.ndarray) -> ScatterMatrix:
+    """
+    Computes D @ S @ D^-1 for D = diag(d) with |d| = 1 for a layer with S11 = S22 and S12 = S21.
+    """
+    scale = d[:, np.newaxis]*np.conjugate(d)[np.newaxis, :]
+    S_shifted = ScatterMatrix()
+    S_shifted.S11 = S.S11*scale
+    S_shifted.S12 = S.S12*scale
+    S_shifted.S22 = S_shifted.S11
+    S_shifted.S21 = S_shifted.S12
+    return S_shifted
 
-    S11 = Mul @ S11_Second
-    S12 = Mul.copy() @ S12_Second
-    S = ScatterMatrix()
-    S.S11 = S11
-    S.S12 = S12
-    S.S22 = S11
-    S.S21 = S12
-    return S
-     
 
 def _eigen_vectors_vacuum_V0_W0(system_data: _ScatterMatrixSystemData) -> tuple[np.ndarray]:
     
@@ -301,7 +644,8 @@ def _calculate_scatter_ref_trn(system_data: _ScatterMatrixSystemData, V0:np.ndar
     
 
 def _combine_matrix(a00: np.ndarray, a01: np.ndarray, a10: np.ndarray, a11: np.ndarray) -> np.ndarray:
-    ab = np.hstack((a00,a01))
-    cd = np.hstack((a10,a11))
-    return np.vstack((ab,cd))
+    # Works on single matrices and on stacks of matrices
+    ab = np.concatenate((a00,a01), axis=-1)
+    cd = np.concatenate((a10,a11), axis=-1)
+    return np.concatenate((ab,cd), axis=-2)
     
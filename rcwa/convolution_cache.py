@@ -0,0 +1,55 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Hashable, Optional
+
+from rcwa.calculator_scatter_matrix import LayerStackConvolution
+
+
+class ConvolutionCache:
+    """
+    Least recently used cache of `LayerStackConvolution` objects, bounded by their size in bytes.
+
+    The convolution matrices of a hologram only depend on its structure (recording parameters,
+    layer spacing and harmonic order), not on the incident wave. Caching them avoids rebuilding
+    and inverting them for every point of an angle or wavelength sweep.
+    """
+
+    def __init__(self, max_bytes: int = 256*1024**2):
+        self.max_bytes: int = max_bytes
+        self._entries: OrderedDict[Hashable, LayerStackConvolution] = OrderedDict()
+        self._nbytes: int = 0
+        self._lock: Lock = Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def get(self, key: Hashable) -> Optional[LayerStackConvolution]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: LayerStackConvolution) -> None:
+        """
+        Stores the value and evicts the least recently used entries until the size limit is met.
+        Values larger than the limit are not stored.
+        """
+        nbytes = value.nbytes
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._nbytes -= old.nbytes
+            self._entries[key] = value
+            self._nbytes += nbytes
+            while self._nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._nbytes -= evicted.nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
@@ -1,11 +1,9 @@
 import numpy as np
-from typing import Hashable
+from typing import Hashable, Iterator
 import math
 from rcwa.calculator_scatter_matrix import ScatterMatrix
-from rcwa.calculator_diffraction_efficiency import calculate_efficiency_Rs_Rp_Ts_Tp
 from rcwa.volume_hologram_3D import VolumeHologram3D
 from rcwa.rcwa_exception import RCWAError
-from numbers import Number
 
 class HOEThicknessDependence(VolumeHologram3D):
     """
@@ -57,32 +55,52 @@ class HOEThicknessDependence(VolumeHologram3D):
         self.thickness = thickness
         self.nz_steps_per_cycle = False
 
-        accumulated_scatter_matrices = self.get_accumulated_scatter_matrices()
-        keys = accumulated_scatter_matrices.keys()
-
-        only_numbers = sorted([num for num in keys if isinstance(num, Number)])
-        dimz = len(only_numbers)
+        dimz = nz+1
         dimx = 2*self.harmonic_order+1 
         dimy = 3
 
-        Rs_values = np.ones((dimy, dimx, dimz), dtype=np.float32)*np.NAN
-        Rp_values = np.ones((dimy, dimx, dimz), dtype=np.float32)*np.NAN
-        Ts_values = np.ones((dimy, dimx, dimz), dtype=np.float32)*np.NAN
-        Tp_values = np.ones((dimy, dimx, dimz), dtype=np.float32)*np.NAN
-
-        pram = self._rcwa_parameter
-        for i in range(dimz):
-            num = only_numbers[i]
-            next_S = accumulated_scatter_matrices[num]            
-            S_global = self._build_S_Global(accumulated_scatter_matrices, next_S)
-            Rs, Rp, Ts, Tp = calculate_efficiency_Rs_Rp_Ts_Tp(pram,S_global)
+        Rs_values = np.full((dimy, dimx, dimz), np.nan, dtype=np.float32)
+        Rp_values = np.full((dimy, dimx, dimz), np.nan, dtype=np.float32)
+        Ts_values = np.full((dimy, dimx, dimz), np.nan, dtype=np.float32)
+        Tp_values = np.full((dimy, dimx, dimz), np.nan, dtype=np.float32)
+        thickness_values = np.full(dimz, np.nan)
+
+        for i, (l, Rs, Rp, Ts, Tp) in enumerate(self.iter_efficiency_per_step(nz, thickness)):
             Rs_values[:,:,i] = Rs 
             Rp_values[:,:,i] = Rp
             Ts_values[:,:,i] = Ts
             Tp_values[:,:,i] = Tp
+            thickness_values[i] = l
         
-        thickness_values = np.array(only_numbers)
         return thickness_values, Rs_values, Rp_values, Ts_values, Tp_values
+
+    def iter_efficiency_per_step(self, nz: int, thickness: float) -> Iterator[tuple]:
+        """
+        Generator version of `compute_efficiency_per_step`.
+
+        The layers are folded in one after another and only the running device is kept, 
+        so the memory does not grow with `nz`.
+
+        Parameters:
+        -----------
+        nz : int
+            Number of thickness steps.
+        thickness : float
+            Total thickness of the hologram.
+
+        Yields:
+        -------
+        tuple[float, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+            (thickness, Rs, Rp, Ts, Tp) for the thicknesses 0, thickness/nz, ..., thickness.
+        """
+        self.n_z = nz
+        self.thickness = thickness
+        self.nz_steps_per_cycle = False
+
+        scatter_matrices_of_system = self.get_scatter_matrices_of_system()
+        for l, device in self.iter_accumulated_scatter_matrices(scatter_matrices_of_system):
+            Rs, Rp, Ts, Tp = self._calc_efficiency_of_device(scatter_matrices_of_system, device)
+            yield l, Rs, Rp, Ts, Tp
     
     def compute_efficiency_per_cycle(self, thickness, max_steps=None) -> tuple[np.ndarray]:
         """
@@ -153,7 +171,7 @@ class HOEThicknessDependence(VolumeHologram3D):
             raise RCWAError("Too many steps for this thickness", "Increase max_steps")
         self.nz_steps_per_cycle = True
         self._l_one_cycle = self.get_cycle_length_z_direction()
-        self._accumulated_scatter_matrices = self.get_accumulated_scatter_matrices()
+        self._accumulated_scatter_matrices = self.get_full_and_rest_scatter_matrices()
         self._S_one_cycle  = self._accumulated_scatter_matrices["full"]
         self._current_length = 0.0        
         self._max_steps = max_steps
@@ -194,7 +212,6 @@ class HOEThicknessDependence(VolumeHologram3D):
         l = self._current_length        
         S_one_cycles = self._S_one_cycle
         device = self._device
-        pram = self._rcwa_parameter
         accumulated_scatter_matrices = self._accumulated_scatter_matrices
 
         if device is None:
@@ -204,8 +221,7 @@ class HOEThicknessDependence(VolumeHologram3D):
             device = ScatterMatrix.redheffer_star_product(device, S_one_cycles)            
             l+=self._l_one_cycle
 
-        S_global = self._build_S_Global(accumulated_scatter_matrices, device)
-        Rs, Rp, Ts, Tp = calculate_efficiency_Rs_Rp_Ts_Tp(pram,S_global)
+        Rs, Rp, Ts, Tp = self._calc_efficiency_of_device(accumulated_scatter_matrices, device)
         self._device = device
         self._current_length = l
         
@@ -8,7 +8,8 @@ class LayerData:
                  er: Union[np.complex128, np.ndarray], 
                  ur: Union[np.complex128, np.ndarray],
                  Li: float,
-                 identifier: Hashable):
+                 identifier: Hashable,
+                 is_spectrum: bool = False):
         
         if type(er) == np.ndarray:
             dimx = er.shape[1]
@@ -19,4 +20,6 @@ class LayerData:
         self.er: Union[np.complex_, np.ndarray] = er
         self.ur: Union[np.complex_, np.ndarray] = ur
         self.Li: float = Li
-        self.identifier: Hashable = identifier 
\ No newline at end of file
+        self.identifier: Hashable = identifier
+        # er and ur arrays are already centered and normalized Fourier coefficients
+        self.is_spectrum: bool = is_spectrum 
\ No newline at end of file
@@ -4,6 +4,10 @@ class RCWAError(Exception):
         super().__init__(message)
         self.info: str = info
         self.message = message
+
+    def __reduce__(self):
+        # pickled with both arguments, e.g. to return it from a worker process
+        return (type(self), (self.message, self.info))
         
 class RCWAWrongParameterError(RCWAError):
     def __init__(self, message, info):
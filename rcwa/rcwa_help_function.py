@@ -7,13 +7,20 @@ def build_pq_grid(pram: Parameter) -> tuple[np.ndarray]:
     grid_p, grid_q = np.meshgrid(hx, hy)
     return grid_p, grid_q
 
-def build_kxy_norm(pram: Parameter) -> tuple[np.ndarray]:
+def build_kxy_norm_vectors(pram: Parameter) -> tuple[np.ndarray]:
+    """
+    Diagonals of the normalized kx and ky matrices of `build_kxy_norm`.
+    """
     grid_p, grid_q = build_pq_grid(pram)
     ps = grid_p.flatten()
     qs = grid_q.flatten()
     
     kxd = (pram.kx_inc-ps*pram.t_1x-qs*pram.t_2x)/pram.k0
     kyd = (pram.ky_inc-ps*pram.t_1y-qs*pram.t_2y)/pram.k0
+    return kxd.astype(pram.dtype), kyd.astype(pram.dtype)
+
+def build_kxy_norm(pram: Parameter) -> tuple[np.ndarray]:
+    kxd, kyd = build_kxy_norm_vectors(pram)
     dim = kyd.shape[0]
     kxn = np.zeros((dim, dim), dtype=pram.dtype)
     kyn = np.zeros((dim, dim), dtype=pram.dtype)
@@ -30,6 +37,17 @@ def build_kz_norm_ref_trn(pram: Parameter) -> tuple[np.ndarray]:
     kzn_trn = _calc_kz_norm_sqrt(pre_trn, kxn, kyn)
     return kzn_ref, kzn_trn
 
+def build_kz_norm_ref_trn_vectors(pram: Parameter) -> tuple[np.ndarray]:
+    """
+    Diagonals of the normalized kz matrices of `build_kz_norm_ref_trn`.
+    """
+    pre_ref = np.conjugate(pram.er_ref) * np.conjugate(pram.ur_ref)
+    pre_trn = np.conjugate(pram.er_trn) * np.conjugate(pram.ur_trn)
+    kxd, kyd = build_kxy_norm_vectors(pram)
+    kz_ref = -np.conjugate(np.sqrt(pre_ref - (kxd**2 + kyd**2)))
+    kz_trn = np.conjugate(np.sqrt(pre_trn - (kxd**2 + kyd**2)))
+    return kz_ref, kz_trn
+
 def _calc_kz_norm_sqrt(pre: complex, kxn: np.ndarray, kyn: np.ndarray) -> np.ndarray:        
     dim = kxn.shape[0]
     I = np.eye(dim, dtype=Parameter.dtype)
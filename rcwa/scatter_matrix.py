@@ -1,6 +1,8 @@
 import numpy as np
-from numpy.linalg import inv
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 from rcwa.parameter import Parameter
+from rcwa.stage_timing import stage
 
 class ScatterMatrix:
 
@@ -19,30 +21,139 @@ class ScatterMatrix:
         return clone
 
     @staticmethod
-    def redheffer_star_product(SA: "ScatterMatrix", SB: "ScatterMatrix") -> "ScatterMatrix":
-        dim = SA.S11.shape[0]
-        I = np.eye(dim, dtype=Parameter.dtype)       
-        SAB = ScatterMatrix()
-        
-        
-        bracket_1 = inv(I - (SB.S11 @ SA.S22))
-        bracket_2 = inv(I - (SA.S22 @ SB.S11))
-        #SAB11        
-        second = SA.S12 @ bracket_1 @ (SB.S11 @ SA.S21)
-        SAB.S11 = SA.S11 + second
+    @stage("star_product")
+    def redheffer_star_product(SA: "ScatterMatrix", SB: "ScatterMatrix", out: Optional["ScatterMatrix"] = None) -> "ScatterMatrix":
+        """
+        Redheffer star product SA * SB.
 
-        #SAB12 
-        SAB.S12 = SA.S12 @ bracket_1 @ SB.S12
+        Both brackets inv(I - SB.S11 @ SA.S22) and inv(I - SA.S22 @ SB.S11) are expressed with
+        the second one (push-through identity), so a single LU factorization of 
+        I - SA.S22 @ SB.S11 is solved for [SA.S21, SA.S22 @ SB.S12]. No inverse is formed.
+        Works on single matrices and on stacks of matrices.
+
+        The result is written into `out`, if given. `out` must not share memory with SA or SB.
+        """
+        dim = SA.S11.shape[-1]
+        SAB = out if out is not None else ScatterMatrix._empty_like(SA.S11)
+
+        M = SA.S22 @ SB.S11
+        np.negative(M, out=M)
+        diagonal = np.arange(dim)
+        M[..., diagonal, diagonal] += 1
+
+        rhs = np.concatenate((SA.S21, SA.S22 @ SB.S12), axis=-1)
+        Y = np.linalg.solve(M, rhs)
+        Y1 = Y[..., :dim] # bracket_2 @ SA.S21
+        Y2 = Y[..., dim:] # bracket_2 @ SA.S22 @ SB.S12
+
+        #SAB11 = SA11 + SA12 @ bracket_1 @ SB11 @ SA21 = SA11 + SA12 @ SB11 @ Y1
+        np.matmul(SA.S12 @ SB.S11, Y1, out=SAB.S11)
+        SAB.S11 += SA.S11
+
+        #SAB12 = SA12 @ bracket_1 @ SB12 = SA12 @ (SB12 + SB11 @ Y2)
+        np.matmul(SA.S12, SB.S12 + (SB.S11 @ Y2), out=SAB.S12)
 
         #SAB21
-        SAB.S21 = SB.S21 @ bracket_2 @ SA.S21
+        np.matmul(SB.S21, Y1, out=SAB.S21)
 
         #SAB22
-        second = SB.S21 @ bracket_2 @ (SA.S22 @ SB.S12)
-        SAB.S22 = SB.S22 + second
+        np.matmul(SB.S21, Y2, out=SAB.S22)
+        SAB.S22 += SB.S22
 
         return SAB
-    
+
+    @staticmethod
+    @stage("star_product")
+    def redheffer_star_product_columns(SA: "ScatterMatrix", SB: "ScatterMatrix", columns: list[int]) -> tuple[np.ndarray]:
+        """
+        Computes only the given columns of S11 and S21 of the star product SA * SB.
+
+        Only these columns of SA.S11 and SA.S21 enter the result, SAB.S12 and SAB.S22
+        are not computed. Used to propagate the incident wave through the last star product.
+
+        Returns:
+        --------
+        tuple[np.ndarray, np.ndarray]
+            SAB.S11[:, columns] and SAB.S21[:, columns]
+        """
+        dim = SA.S11.shape[-1]
+        M = SA.S22 @ SB.S11
+        np.negative(M, out=M)
+        diagonal = np.arange(dim)
+        M[..., diagonal, diagonal] += 1
+        Y1 = np.linalg.solve(M, SA.S21[..., :, columns]) # bracket_2 @ SA.S21
+
+        S11_columns = SA.S11[..., :, columns] + (SA.S12 @ (SB.S11 @ Y1))
+        S21_columns = SB.S21 @ Y1
+        return S11_columns, S21_columns
+
+    @staticmethod
+    @stage("star_product_tree")
+    def redheffer_star_product_tree(stack: "ScatterMatrix", max_workers: int = 1) -> "ScatterMatrix":
+        """
+        Star product S_0 * S_1 * ... * S_L-1 of a stack of scatter matrices (blocks of shape (L, N, N)).
+
+        The star product is associative, so neighbouring pairs are multiplied in a balanced 
+        binary tree. Every level is one batched star product of all pairs, the depth is log2(L)
+        instead of L. With `max_workers` > 1, the pairs of a level are split into chunks that are 
+        computed in a thread pool (numpy.linalg releases the GIL). The star products inside the 
+        pool are not recorded by the stage timing.
+        """
+        executor = ThreadPoolExecutor(max_workers) if max_workers > 1 else None
+        try:
+            while stack.S11.shape[0] > 1:
+                n_layers = stack.S11.shape[0]
+                n_pairs = n_layers//2
+                SA = ScatterMatrix.take(stack, slice(0, 2*n_pairs, 2))
+                SB = ScatterMatrix.take(stack, slice(1, 2*n_pairs, 2))
+                if (executor is None) or (n_pairs < 2):
+                    SAB = ScatterMatrix.redheffer_star_product(SA, SB)
+                else:
+                    chunks = np.array_split(np.arange(n_pairs), min(max_workers, n_pairs))
+                    futures = [executor.submit(ScatterMatrix.redheffer_star_product, ScatterMatrix.take(SA, chunk), ScatterMatrix.take(SB, chunk)) for chunk in chunks]
+                    SAB = ScatterMatrix.concatenate([future.result() for future in futures])
+                if n_layers % 2 == 1:
+                    # the unpaired last layer stays at the end
+                    SAB = ScatterMatrix.concatenate([SAB, ScatterMatrix.take(stack, slice(n_layers-1, n_layers))])
+                stack = SAB
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return ScatterMatrix.take(stack, 0)
+
+    @staticmethod
+    def take(S: "ScatterMatrix", index) -> "ScatterMatrix":
+        """
+        Scatter matrix with the blocks S.Sij[index] of a stack.
+        """
+        S_index = ScatterMatrix()
+        S_index.S11 = S.S11[index]
+        S_index.S12 = S.S12[index]
+        S_index.S21 = S.S21[index]
+        S_index.S22 = S.S22[index]
+        return S_index
+
+    @staticmethod
+    def stack(matrices: list["ScatterMatrix"]) -> "ScatterMatrix":
+        """
+        Stack of scatter matrices, the blocks have the shape (L, N, N).
+        """
+        S = ScatterMatrix()
+        S.S11 = np.stack([M.S11 for M in matrices])
+        S.S12 = np.stack([M.S12 for M in matrices])
+        S.S21 = np.stack([M.S21 for M in matrices])
+        S.S22 = np.stack([M.S22 for M in matrices])
+        return S
+
+    @staticmethod
+    def concatenate(stacks: list["ScatterMatrix"]) -> "ScatterMatrix":
+        S = ScatterMatrix()
+        S.S11 = np.concatenate([M.S11 for M in stacks])
+        S.S12 = np.concatenate([M.S12 for M in stacks])
+        S.S21 = np.concatenate([M.S21 for M in stacks])
+        S.S22 = np.concatenate([M.S22 for M in stacks])
+        return S
+
     @staticmethod
     def unity(dim_Sij: int) -> "ScatterMatrix":
         S = ScatterMatrix()
@@ -52,4 +163,18 @@ class ScatterMatrix:
         S.S22 = np.zeros((dim_Sij, dim_Sij), dtype=Parameter.dtype)
         return S
 
+    @staticmethod
+    def empty(dim_Sij: int) -> "ScatterMatrix":
+        """
+        Uninitialized scatter matrix, used as output buffer.
+        """
+        return ScatterMatrix._empty_like(np.empty((dim_Sij, dim_Sij), dtype=Parameter.dtype))
 
+    @staticmethod
+    def _empty_like(block: np.ndarray) -> "ScatterMatrix":
+        S = ScatterMatrix()
+        S.S11 = np.empty_like(block)
+        S.S12 = np.empty_like(block)
+        S.S21 = np.empty_like(block)
+        S.S22 = np.empty_like(block)
+        return S
@@ -0,0 +1,153 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+
+class StageStatistics:
+    """
+    Wall time, call count and peak allocated bytes of one stage.
+    """
+    def __init__(self):
+        self.calls: int = 0
+        self.seconds: float = 0.0
+        self.peak_bytes: int = 0
+
+    def add(self, calls: int, seconds: float, peak_bytes: int) -> None:
+        self.calls += calls
+        self.seconds += seconds
+        self.peak_bytes = max(self.peak_bytes, peak_bytes)
+
+
+class _Frame:
+    def __init__(self, start_bytes: int):
+        self.start_bytes: int = start_bytes
+        self.peak_bytes: int = start_bytes
+
+
+class StageTimer:
+    """
+    Collects the statistics of the solver stages (see `stage`) while it is active in
+    `collect_stage_timing`.
+
+    The peak allocated bytes of a stage are the maximum memory allocated above the memory at the
+    start of the stage (including nested stages). They are only recorded with `trace_memory`,
+    which uses `tracemalloc` and slows the calculation down. The memory is traced for the whole
+    process, so calculations in other threads are included.
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory: bool = trace_memory
+        self.stages: dict[str, StageStatistics] = dict()
+        self._frames: list[_Frame] = list()
+
+    def record(self, name: str, seconds: float, peak_bytes: int = 0, calls: int = 1) -> None:
+        statistics = self.stages.get(name)
+        if statistics is None:
+            statistics = StageStatistics()
+            self.stages[name] = statistics
+        statistics.add(calls, seconds, peak_bytes)
+
+    def merge(self, stages: dict[str, tuple]) -> None:
+        """
+        Adds the statistics of another timer, given as `to_dict()`, e.g. of a worker process.
+        """
+        for name, (calls, seconds, peak_bytes) in stages.items():
+            self.record(name, seconds, peak_bytes, calls)
+
+    def to_dict(self) -> dict[str, tuple]:
+        """
+        Statistics as name: (calls, seconds, peak_bytes), can be pickled.
+        """
+        return {name: (s.calls, s.seconds, s.peak_bytes) for name, s in self.stages.items()}
+
+    def reset(self) -> None:
+        self.stages = dict()
+
+    def report(self) -> str:
+        """
+        Table of the stages, sorted by the total time.
+        """
+        lines = [f"{'stage':<22}{'calls':>9}{'time [s]':>11}{'peak [MB]':>11}"]
+        stages = sorted(self.stages.items(), key=lambda item: item[1].seconds, reverse=True)
+        for name, s in stages:
+            peak = f"{s.peak_bytes/1024**2:>11.1f}" if self.trace_memory else f"{'-':>11}"
+            lines.append(f"{name:<22}{s.calls:>9}{s.seconds:>11.3f}" + peak)
+        return "\n".join(lines)
+
+    def _enter(self) -> Optional[_Frame]:
+        if not self.trace_memory:
+            return None
+        current, peak = tracemalloc.get_traced_memory()
+        if len(self._frames) != 0:
+            self._frames[-1].peak_bytes = max(self._frames[-1].peak_bytes, peak)
+        tracemalloc.reset_peak()
+        frame = _Frame(current)
+        self._frames.append(frame)
+        return frame
+
+    def _exit(self, frame: Optional[_Frame]) -> int:
+        if frame is None:
+            return 0
+        _, peak = tracemalloc.get_traced_memory()
+        frame.peak_bytes = max(frame.peak_bytes, peak)
+        self._frames.pop()
+        if len(self._frames) != 0:
+            self._frames[-1].peak_bytes = max(self._frames[-1].peak_bytes, frame.peak_bytes)
+        return max(frame.peak_bytes - frame.start_bytes, 0)
+
+
+# Timer of the current thread (or context), None if the instrumentation is off
+_active_timer: ContextVar[Optional[StageTimer]] = ContextVar("rcwa_stage_timer", default=None)
+
+
+@contextmanager
+def collect_stage_timing(timer: Optional[StageTimer] = None, trace_memory: bool = False) -> Iterator[StageTimer]:
+    """
+    Records the solver stages of all calculations in this thread within the `with` block.
+
+    Example:
+        with collect_stage_timing() as timer:
+            hoe.calc_rcwa()
+        print(timer.report())
+
+    Parameters:
+    -----------
+    timer : StageTimer, optional
+        Timer to add the statistics to, e.g. to collect several calculations. A new timer is used by default.
+    trace_memory : bool
+        Record the peak allocated bytes per stage with `tracemalloc`. Only used for a new timer.
+    """
+    if timer is None:
+        timer = StageTimer(trace_memory)
+    started_tracing = False
+    if timer.trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        started_tracing = True
+    token = _active_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _active_timer.reset(token)
+        if started_tracing:
+            tracemalloc.stop()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Marks a stage of the solver, as `with stage(name):` or as decorator `@stage(name)`.
+    Without an active `collect_stage_timing`, nothing is recorded.
+    """
+    timer = _active_timer.get()
+    if timer is None:
+        yield
+        return
+    frame = timer._enter()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        timer.record(name, seconds, timer._exit(frame))
@@ -1,11 +1,15 @@
 import numpy as np
 import pandas as pd
-from typing import Hashable
+import os
+from typing import Hashable, Iterator, Optional
 from rcwa.parameter import Parameter
 from rcwa.layer_data import LayerData
-from rcwa.calculator_scatter_matrix import calc_all_scatter_matrices_of_system
+from rcwa.calculator_scatter_matrix import calc_all_scatter_matrices_of_system, calc_scatter_matrices_of_phase_shifted_layers
+from rcwa.calculator_scatter_matrix import calc_scatter_matrices_of_layer_stack, build_layer_stack_convolution, LayerStackConvolution
+from rcwa.convolution_cache import ConvolutionCache
+from rcwa.stage_timing import stage
 from rcwa.calculator_scatter_matrix import ScatterMatrix
-from rcwa.calculator_diffraction_efficiency import calculate_efficiency_Rs_Rp_Ts_Tp
+from rcwa.calculator_diffraction_efficiency import calculate_efficiency_from_columns, get_incident_columns
 from rcwa.rcwa_help_function import build_pq_grid
 from rcwa.rcwa_exception import RCWAWrongParameterError
 
@@ -46,9 +50,27 @@ class VolumeHologram3D():
         Steps in z direction for a cycle or complete thickness.
     add_ar_layer : bool
         Whether to add an anti-reflection (AR) layer.
+    use_analytic_spectrum : bool
+        Use the closed-form Fourier coefficients of the sinusoidal grating instead of
+        sampling er on a grid and applying an FFT per layer.
+    use_convolution_cache : bool
+        Reuse the convolution matrices of the layers from `convolution_cache` for
+        calculations with the same hologram structure, e.g. in angle or wavelength sweeps.
+    use_cycle_cache : bool
+        In cycle mode, keep the layer scatter matrices and the powers S_cycle^(2^k) of the last
+        recording configuration and incident wave. A thickness then only costs O(log n) star products.
+    use_tree_reduction : bool
+        If only the full device of the layers is needed, multiply the layers as a balanced
+        binary tree of batched star products instead of one after another. The number of 
+        star products is the same, so this only pays off with several `tree_reduction_workers`
+        for a single calculation, not within the worker processes of a sweep.
+    tree_reduction_workers : int
+        Number of threads for the tree reduction, 1 computes the batches in the calling thread.
 
     """
 
+    convolution_cache: ConvolutionCache = ConvolutionCache()
+
     def __init__(self):
         # System parameter
         self.lam: float = 0.5
@@ -75,6 +97,11 @@ class VolumeHologram3D():
         
         self.nz_steps_per_cycle: bool = False
         self.add_ar_layer: bool = True  
+        self.use_analytic_spectrum: bool = True
+        self.use_convolution_cache: bool = True
+        self.use_cycle_cache: bool = True
+        self.use_tree_reduction: bool = False
+        self.tree_reduction_workers: int = os.cpu_count() or 1
 
         #For calculations
         self._dx: float = 1.0
@@ -82,11 +109,20 @@ class VolumeHologram3D():
         self._dz: float = 1.0
         self._n_x: int = 101    
         self._rcwa_parameter: Parameter = None   
+        self._cycle_cache: _CyclePowerCache = None
+
+    @property
+    def rcwa_parameter(self) -> Parameter:
+        """
+        RCWA parameter of the last calculation, e.g. of `get_scatter_matrices_of_system`.
+        """
+        return self._rcwa_parameter
 
     @property
     def _k0_hoe(self) -> float:
         return 2*np.pi/self.lam_hoe  
 
+    @stage("calc_rcwa")
     def calc_rcwa(self) -> tuple[np.ndarray]:
         """
         Computes the diffraction efficiencies of the volume hologram using RCWA.
@@ -99,35 +135,25 @@ class VolumeHologram3D():
             - Tp : Transmission efficiency for p-polarization.
         """
 
-        accumulated_scatter_matrices = self.get_accumulated_scatter_matrices()
-        pram = self._rcwa_parameter
-
         # To build the device:
         # n = thickness/ periods length 
         # # n = 2**powers + rest                
         powers = self._divide_thickness_in_powers_of_two()
-        device = ScatterMatrix.unity(pram.dim_scattering_matrix_Sij)
-        if len(powers)!=0:
-            for x in range(max(powers)+1):
-                if x != 0:
-                    temp = ScatterMatrix.redheffer_star_product(temp, temp)
-                else:
-                    temp = accumulated_scatter_matrices["full"] # one periods length    
-                if x in powers:
-                    device = ScatterMatrix.redheffer_star_product(device, temp)
+        rest = self._get_thickness_rest(powers)
+        if self.nz_steps_per_cycle and self.use_cycle_cache:
+            accumulated_scatter_matrices, device = self._get_cached_cycle_device(powers, rest)
+        else:
+            accumulated_scatter_matrices = self.get_full_and_rest_scatter_matrices(rest)
+            device = self._build_device_of_powers(accumulated_scatter_matrices["full"], powers)
 
         #-------------------------
         # rest part 
-        rest = self._get_thickness_rest(powers)
         if rest is not None:
-            numerical_keys = [k for k in accumulated_scatter_matrices.keys() if type(k)!=str]
-            closest_key = min(numerical_keys, key=lambda k: abs(k - rest))        
-            temp = accumulated_scatter_matrices[closest_key]
+            temp = accumulated_scatter_matrices["rest"]
             device = ScatterMatrix.redheffer_star_product(device, temp)
         #----------------------------
 
-        S_Global = self._build_S_Global(accumulated_scatter_matrices, device)
-        Rs, Rp, Ts, Tp = calculate_efficiency_Rs_Rp_Ts_Tp(pram,S_Global)
+        Rs, Rp, Ts, Tp = self._calc_efficiency_of_device(accumulated_scatter_matrices, device)
         return Rs, Rp, Ts, Tp
     
     def ref_trn_dataframe(self, order_max: int) -> pd.DataFrame:
@@ -170,6 +196,7 @@ class VolumeHologram3D():
 
         return df
 
+    @stage("er3D_ur3D")
     def calc_er3D_ur3D(self) -> None:
         # coordinates are in rotated system
         mesh_x, mesh_y, mesh_z = self._calc_grid()
@@ -178,6 +205,44 @@ class VolumeHologram3D():
         ur3D = np.ones(er3D.shape, dtype=np.complex128)
         return er3D, ur3D
 
+    @stage("er_spectra")
+    def calc_er_spectra(self) -> np.ndarray:
+        """
+        Computes the centered Fourier coefficients of er for every layer in closed form.
+
+        With n = n0 + dn*cos(gx*x + gz*z), er = n**2 only contains the harmonics 0, +-1 and +-2:
+        er = n0**2 + dn**2/2 + 2*n0*dn*cos(arg) + dn**2/2*cos(2*arg).
+        The coefficients are identical to the FFT of the sampled er, because the sampling
+        covers exactly one grating period.
+
+        Returns:
+        --------
+        np.ndarray
+            Spectra of shape (n_z, 1, nx), centered at the zeroth harmonic.
+        """
+        # coordinates are in rotated system
+        self._set_spacing_of_grids_rot_system()
+        g = self.get_grating_vec_rot()
+        z = np.arange(self.n_z)*self._dz
+        phase = np.exp(1j*g[2]*z)
+
+        c0 = self.n**2 + 0.5*self.dn**2
+        c1 = self.n*self.dn*phase
+        c2 = 0.25*self.dn**2*phase**2
+
+        m = max(2*self.harmonic_order, 2)
+        spectra = np.zeros((self.n_z, 1, 2*m+1), dtype=np.complex128)
+        if abs(g[0]) < 10E-8:
+            # No modulation in x, all harmonics fall into the zeroth order
+            spectra[:, 0, m] = c0 + 2*c1.real + 2*c2.real
+        else:
+            spectra[:, 0, m] = c0
+            spectra[:, 0, m+1] = c1
+            spectra[:, 0, m-1] = np.conjugate(c1)
+            spectra[:, 0, m+2] = c2
+            spectra[:, 0, m-2] = np.conjugate(c2)
+        return spectra
+
     def get_grating_vec(self) -> np.ndarray:
         kn_rec1, kn_rec2 = self._get_kn_record()
         g = kn_rec1 - kn_rec2 
@@ -204,26 +269,118 @@ class VolumeHologram3D():
         Accumulate all scatter matrices.
         S[length_i] = S_0 * S_1 *....* S_i. * Redheffer Star Product
         """
+        scatter_matrices_of_system = self.get_scatter_matrices_of_system()
+        scatter_matrices_per_length = self._get_boundary_scatter_matrices(scatter_matrices_of_system)
+        for length, device in self.iter_accumulated_scatter_matrices(scatter_matrices_of_system):
+            scatter_matrices_per_length[length] = device
+        
+        scatter_matrices_per_length["full"] = device 
+        return scatter_matrices_per_length
+
+    def get_full_and_rest_scatter_matrices(self, rest: Optional[float] = None) -> dict[Hashable, ScatterMatrix]:
+        """
+        Accumulates the layers like `get_accumulated_scatter_matrices`, but only keeps 
+        the full device ("full") and the partial device of the length `rest` ("rest").
+        The partial device consists of the full layers within `rest` and the next layer, 
+        truncated to the remaining length.
+
+        Parameters:
+        -----------
+        rest : float, optional
+            Length of the partial device. If None, "rest" is not computed.
+
+        Returns:
+        --------
+        dict[Hashable, ScatterMatrix]
+            Keys "S_ref", "S_trn", "ar", "full" and "rest".
+        """
+        scatter_matrices_of_system = self.get_scatter_matrices_of_system()
+        scatter_matrices = self._get_boundary_scatter_matrices(scatter_matrices_of_system)
+        
+        if (rest is None) and self.use_tree_reduction:
+            scatter_matrices["full"] = self._reduce_layers(scatter_matrices_of_system)
+            return scatter_matrices
+
+        rest_step = None
+        if rest is not None:
+            rest_step, rest_length = self._split_rest(rest)
+
+        for i, (_, device) in enumerate(self.iter_accumulated_scatter_matrices(scatter_matrices_of_system)):
+            if i == rest_step:
+                scatter_matrices["rest"] = device
+        scatter_matrices["full"] = device
+
+        if (rest is not None) and (rest_length != 0):
+            S_truncated = self._calc_truncated_layer(rest_step, rest_length)
+            scatter_matrices["rest"] = ScatterMatrix.redheffer_star_product(scatter_matrices["rest"], S_truncated)
+        return scatter_matrices
+
+    def get_scatter_matrices_of_system(self) -> dict[Hashable, ScatterMatrix]:
+        """
+        Scatter matrices of the z layers (keys 0 to n_z-1), the AR layer ("ar"),
+        the reflection ("S_ref") and transmission ("S_trn") region.
+        """
         self._build_rcwa_pram()
         pram = self._rcwa_parameter
-        scatter_matrices_of_system = self._calc_scatter_matrices_of_system(pram)
-        scatter_matrices_per_length: dict[Hashable, ScatterMatrix] = dict()
-        scatter_matrices_per_length["S_ref"] = scatter_matrices_of_system["S_ref"]
-        scatter_matrices_per_length["S_trn"] = scatter_matrices_of_system["S_trn"]
-        scatter_matrices_per_length["ar"] = scatter_matrices_of_system["ar"]
-        dimS = pram.dim_scattering_matrix_Sij
+        return self._calc_scatter_matrices_of_system(pram)
+
+    def iter_accumulated_scatter_matrices(self, scatter_matrices_of_system: dict[Hashable, ScatterMatrix]) -> Iterator[tuple[float, ScatterMatrix]]:
+        """
+        Folds the z layers one after another into the device.
+
+        Yields (length, device) for the unity device at length 0 and after every layer. 
+        Only the running device is kept, every yielded device is a new object.
+        """
+        dimS = self._rcwa_parameter.dim_scattering_matrix_Sij
         device = ScatterMatrix.unity(dimS)
         length = 0.0        
-        scatter_matrices_per_length[length] = device
+        yield length, device
         for i in range(self.n_z):               
             s_next = scatter_matrices_of_system[i]
             device = ScatterMatrix.redheffer_star_product(device, s_next)
             length += self._dz            
-            scatter_matrices_per_length[length] = device
-        
-        scatter_matrices_per_length["full"] = device 
-        return scatter_matrices_per_length
+            yield length, device
+
+    def _reduce_layers(self, scatter_matrices_of_system: dict[Hashable, ScatterMatrix]) -> ScatterMatrix:
+        """
+        Device of all z layers by a tree reduction, see `ScatterMatrix.redheffer_star_product_tree`.
+        """
+        if self.n_z == 0:
+            return ScatterMatrix.unity(self._rcwa_parameter.dim_scattering_matrix_Sij)
+        stack = ScatterMatrix.stack([scatter_matrices_of_system[i] for i in range(self.n_z)])
+        return ScatterMatrix.redheffer_star_product_tree(stack, self.tree_reduction_workers)
 
+    def _split_rest(self, rest: float) -> tuple[int, float]:
+        """
+        Number of full layers within `rest` and the remaining length of the next layer.
+        """
+        step = min(int(rest/self._dz), self.n_z)
+        length = rest - step*self._dz
+        if (step == self.n_z) or (length < 10E-10*self._dz):
+            length = 0.0
+        return step, length
+
+    def _calc_truncated_layer(self, step: int, length: float) -> ScatterMatrix:
+        """
+        Scatter matrix of layer `step` with the thickness `length` instead of the layer spacing.
+        Only the propagation through the layer changes, the eigenmodes are the same.
+        """
+        pram = self._rcwa_parameter
+        convolution = self._get_layer_convolution(pram)
+        if self._is_phase_shift_possible():
+            g = self.get_grating_vec_rot()
+            phase_shifts = np.array([g[2]*step*self._dz])
+            scatter_matrices = calc_scatter_matrices_of_phase_shifted_layers(pram, convolution, length, phase_shifts, ["rest"])
+        else:
+            scatter_matrices = calc_scatter_matrices_of_layer_stack(pram, convolution.get_layer(step), length, ["rest"])
+        return scatter_matrices["rest"]
+
+    def _get_boundary_scatter_matrices(self, scatter_matrices_of_system: dict[Hashable, ScatterMatrix]) -> dict[Hashable, ScatterMatrix]:
+        scatter_matrices: dict[Hashable, ScatterMatrix] = dict()
+        scatter_matrices["S_ref"] = scatter_matrices_of_system["S_ref"]
+        scatter_matrices["S_trn"] = scatter_matrices_of_system["S_trn"]
+        scatter_matrices["ar"] = scatter_matrices_of_system["ar"]
+        return scatter_matrices
 
     def _build_rcwa_pram(self) -> None:
         rcwa_pram: Parameter = Parameter()
@@ -248,6 +405,53 @@ class VolumeHologram3D():
         rcwa_pram.ur_trn = self.ur_trn
         self._rcwa_parameter =  rcwa_pram
 
+    def _build_device_of_powers(self, S_cycle: ScatterMatrix, powers: list[int]) -> ScatterMatrix:
+        """
+        Device of sum(2**powers) cycles by repeated squaring of `S_cycle`.
+        """
+        dimS = self._rcwa_parameter.dim_scattering_matrix_Sij
+        device = ScatterMatrix.unity(dimS)
+        if len(powers)!=0:
+            # temp alternates between two buffers, the input is always the other one
+            buffers = [ScatterMatrix.empty(dimS) for _ in range(2)]
+            for x in range(max(powers)+1):
+                if x != 0:
+                    temp = ScatterMatrix.redheffer_star_product(temp, temp, out=buffers[x % 2])
+                else:
+                    temp = S_cycle # one periods length    
+                if x in powers:
+                    device = ScatterMatrix.redheffer_star_product(device, temp)
+        return device
+
+    def _get_cached_cycle_device(self, powers: list[int], rest: Optional[float]) -> tuple[dict[Hashable, ScatterMatrix], ScatterMatrix]:
+        """
+        Like `get_full_and_rest_scatter_matrices` and `_build_device_of_powers`, but with the
+        layers, prefixes and powers of the cycle from `_cycle_cache`.
+        """
+        self._build_rcwa_pram()
+        key = self._get_structure_key() + (self.lam, self.theta_deg, self.phi_deg, self.er_trn, self.ur_trn)
+        cache = self._cycle_cache
+        if (cache is None) or (cache.key != key):
+            scatter_matrices_of_system = self._calc_scatter_matrices_of_system(self._rcwa_parameter)
+            if self.use_tree_reduction:
+                S_cycle = self._reduce_layers(scatter_matrices_of_system)
+            else:
+                for _, S_cycle in self.iter_accumulated_scatter_matrices(scatter_matrices_of_system):
+                    pass
+            cache = _CyclePowerCache(key, scatter_matrices_of_system, S_cycle)
+            self._cycle_cache = cache
+
+        scatter_matrices = self._get_boundary_scatter_matrices(cache.scatter_matrices_of_system)
+        scatter_matrices["full"] = cache.get_power(0)
+        if rest is not None:
+            rest_step, rest_length = self._split_rest(rest)
+            device = cache.get_prefix(rest_step)
+            if rest_length != 0:
+                S_truncated = self._calc_truncated_layer(rest_step, rest_length)
+                device = ScatterMatrix.redheffer_star_product(device, S_truncated)
+            scatter_matrices["rest"] = device
+        return scatter_matrices, cache.get_device(powers)
+
     def _divide_thickness_in_powers_of_two(self) -> list[int]:
         """
         Function for fast thickness calculation. 
@@ -280,16 +484,63 @@ class VolumeHologram3D():
         return rest
 
     def _calc_scatter_matrices_of_system(self, pram: Parameter) -> dict[Hashable, ScatterMatrix]:
-        er3D, ur3D = self.calc_er3D_ur3D()      
-        layers_data: list[LayerData] = list()
-        for i in range(self.n_z):
-            data = LayerData(er3D[:,:,i], ur3D[:,:,i], self._dz, i)
-            layers_data.append(data)
-        layers_data.append(self._anti_reflex_layer(pram))
-        pram.layers_data = layers_data      
-        scatter_matrices_of_system = calc_all_scatter_matrices_of_system(pram)      
+        convolution = self._get_layer_convolution(pram)
+        identifiers = range(self.n_z)
+        if self._is_phase_shift_possible():
+            g = self.get_grating_vec_rot()
+            phase_shifts = g[2]*np.arange(self.n_z)*self._dz
+            scatter_matrices_of_system = calc_scatter_matrices_of_phase_shifted_layers(pram, convolution, self._dz, phase_shifts, identifiers)
+        else:
+            scatter_matrices_of_system = calc_scatter_matrices_of_layer_stack(pram, convolution, self._dz, identifiers)
+
+        pram.layers_data = [self._anti_reflex_layer(pram)]
+        scatter_matrices_of_system.update(calc_all_scatter_matrices_of_system(pram))
         return scatter_matrices_of_system
 
+    def _is_phase_shift_possible(self) -> bool:
+        """
+        All z layers are the same grating shifted in x, if the grating is modulated in x-direction.
+        """
+        if not self.use_analytic_spectrum:
+            return False
+        g = self.get_grating_vec_rot()
+        return abs(g[0]) >= 10E-8
+
+    def _get_layer_convolution(self, pram: Parameter) -> LayerStackConvolution:
+        """
+        Convolution matrices of the z layers. They do not depend on the incident wave, 
+        so they are taken from the cache for repeated calls with the same hologram structure.
+        """
+        if not self.use_convolution_cache:
+            return self._build_layer_convolution(pram)
+        key = self._get_structure_key()
+        convolution = VolumeHologram3D.convolution_cache.get(key)
+        if convolution is None:
+            convolution = self._build_layer_convolution(pram)
+            VolumeHologram3D.convolution_cache.put(key, convolution)
+        return convolution
+
+    def _get_structure_key(self) -> tuple:
+        # The layer spacing covers thickness, n_z and the thickness mode
+        self._set_spacing_of_grids_rot_system()
+        return (type(self).__name__, self.theta_rec1, self.theta_rec2, self.phi_rec1, self.phi_rec2, 
+                self.n, self.dn, self.lam_hoe, self.n_z, self._dz, self.harmonic_order, 
+                self.use_analytic_spectrum)
+
+    def _build_layer_convolution(self, pram: Parameter) -> LayerStackConvolution:
+        if self._is_phase_shift_possible():
+            # Only the unshifted first layer is needed
+            er = self.calc_er_spectra()[:1]
+            return build_layer_stack_convolution(pram, er, 1.0+(0j), is_spectrum=True)
+        if self.use_analytic_spectrum:
+            er = self.calc_er_spectra()
+            return build_layer_stack_convolution(pram, er, 1.0+(0j), is_spectrum=True)
+        er3D, ur3D = self.calc_er3D_ur3D()
+        # (ny, nx, n_z) -> (n_z, ny, nx)
+        er = np.moveaxis(er3D, 2, 0)
+        ur = np.moveaxis(ur3D, 2, 0)
+        return build_layer_stack_convolution(pram, er, ur)
+
     def _get_modulation_of_n(self, grid_x, grid_y, grid_z) -> np.ndarray:
         g = self.get_grating_vec_rot()
         gx = g[0]
@@ -357,7 +608,8 @@ class VolumeHologram3D():
     def _calc_grid(self) -> tuple[np.ndarray]:
         self._set_spacing_of_grids_rot_system()
         x = np.arange(self._n_x)*self._dx
-        y = np.arange(3)*self.lam*100
+        # gy = 0 in the rotated system, er does not vary in y-direction
+        y = np.zeros(1)
         z = np.arange(self.n_z)*self._dz
         mesh_x, mesh_y, mesh_z = np.meshgrid(x,y,z)
         return mesh_x, mesh_y, mesh_z
@@ -371,7 +623,16 @@ class VolumeHologram3D():
         layer = LayerData((n_ar**2+(0j)), 1.0+(0j), l, "ar")
         return layer
 
-    def _build_S_Global(self, scatter_matrices_per_length: dict[Hashable, ScatterMatrix], device: ScatterMatrix) -> ScatterMatrix:
+    def _calc_efficiency_of_device(self, scatter_matrices_per_length: dict[Hashable, ScatterMatrix], device: ScatterMatrix) -> tuple[np.ndarray]:
+        """
+        Rs, Rp, Ts, Tp of the device embedded in the AR layers, reflection and transmission region.
+        Only the incident columns are propagated through the last star product with S_ref.
+        """
+        pram = self._rcwa_parameter
+        S11_columns, S21_columns = self._build_S_Global_columns(scatter_matrices_per_length, device)
+        return calculate_efficiency_from_columns(pram, S11_columns, S21_columns)
+
+    def _build_S_Global_columns(self, scatter_matrices_per_length: dict[Hashable, ScatterMatrix], device: ScatterMatrix) -> tuple[np.ndarray]:
         S_ref = scatter_matrices_per_length["S_ref"]
         S_trn = scatter_matrices_per_length["S_trn"]
         S_ar = scatter_matrices_per_length["ar"]
@@ -381,8 +642,8 @@ class VolumeHologram3D():
             device = ScatterMatrix.redheffer_star_product(S_ar, device)
             
         device = ScatterMatrix.redheffer_star_product(device, S_trn)
-        S_Global = ScatterMatrix.redheffer_star_product(S_ref, device)
-        return S_Global
+        columns = get_incident_columns(self._rcwa_parameter)
+        return ScatterMatrix.redheffer_star_product_columns(S_ref, device, columns)
 
     
         
@@ -395,4 +656,57 @@ class VolumeHologram3D():
     
 
 
-    
\ No newline at end of file
+    
+
+
+class _CyclePowerCache:
+    """
+    Scatter matrices of one recording configuration and incident wave in cycle mode.
+
+    Holds the layers of one cycle with the boundaries, the accumulated layers (prefixes) and
+    the powers S_cycle^(2^k). Prefixes and powers are computed once when they are first needed. 
+    The device of the last number of cycles is kept, so a thickness sweep with several values 
+    in the same cycle only adds the rest.
+    The stored matrices are shared and must not be used as `out` of a star product.
+    """
+
+    def __init__(self, key: tuple, scatter_matrices_of_system: dict[Hashable, ScatterMatrix], S_cycle: ScatterMatrix):
+        self.key: tuple = key
+        self.scatter_matrices_of_system: dict[Hashable, ScatterMatrix] = scatter_matrices_of_system
+        self.powers_of_two: list[ScatterMatrix] = [S_cycle]
+        self.prefixes: list[ScatterMatrix] = [ScatterMatrix.unity(S_cycle.S11.shape[-1])]
+        self._device_powers: tuple[int] = None
+        self._device: ScatterMatrix = None
+
+    def get_power(self, k: int) -> ScatterMatrix:
+        """
+        S_cycle^(2^k)
+        """
+        while len(self.powers_of_two) <= k:
+            S = self.powers_of_two[-1]
+            self.powers_of_two.append(ScatterMatrix.redheffer_star_product(S, S))
+        return self.powers_of_two[k]
+
+    def get_prefix(self, n_layers: int) -> ScatterMatrix:
+        """
+        Device of the first `n_layers` layers of the cycle.
+        """
+        while len(self.prefixes) <= n_layers:
+            i = len(self.prefixes) - 1
+            self.prefixes.append(ScatterMatrix.redheffer_star_product(self.prefixes[-1], self.scatter_matrices_of_system[i]))
+        return self.prefixes[n_layers]
+
+    def get_device(self, powers: list[int]) -> ScatterMatrix:
+        """
+        Device of sum(2**powers) cycles.
+        """
+        powers = tuple(powers)
+        if powers == self._device_powers:
+            return self._device
+        S_cycle = self.powers_of_two[0]
+        device = ScatterMatrix.unity(S_cycle.S11.shape[-1])
+        for k in powers:
+            device = ScatterMatrix.redheffer_star_product(device, self.get_power(k))
+        self._device_powers = powers
+        self._device = device
+        return device
@@ -0,0 +1,79 @@
+import numpy as np
+from numbers import Number
+
+
+class AdaptiveSampler:
+    """
+    Chooses the values of an adaptive sweep.
+
+    The sweep starts with a uniform coarse grid. After each round, the intervals where the
+    efficiency curves are not resolved are halved:
+
+    - high curvature: a value deviates by more than `tolerance` from the straight line
+      through its neighbours, both adjacent intervals are refined.
+    - fast change: an efficiency changes by more than 10*`tolerance` within an interval.
+
+    All diffraction orders of Rs, Rp, Ts and Tp are checked. The refinement stops if all intervals
+    meet the tolerance, the interval width reaches `min_width` or `max_points` values are used.
+    If the budget is not sufficient, the intervals with the largest errors are refined first.
+    """
+
+    change_factor: float = 10.0
+
+    def __init__(self, start: Number, end: Number, steps: int, tolerance: float, max_points: int):
+        self.variable: np.ndarray = np.linspace(start, end, int(steps))
+        self.tolerance: float = tolerance
+        self.max_points: int = max_points
+        self.min_width: float = abs(end-start)*10E-8
+        self._features: dict[float, np.ndarray] = dict()
+
+    def add_result(self, value: Number, Rs: np.ndarray, Rp: np.ndarray, Ts: np.ndarray, Tp: np.ndarray) -> None:
+        self._features[float(value)] = np.concatenate([np.ravel(x) for x in (Rs, Rp, Ts, Tp)])
+
+    def get_index(self, value: Number) -> int:
+        """
+        Index of `value` in the current sorted variable values.
+        """
+        return int(np.searchsorted(self.variable, value))
+
+    def refine(self) -> np.ndarray:
+        """
+        Adds the values of the next round to `variable` and returns them (sorted).
+        An empty array means the sweep is converged.
+        """
+        x = self.variable
+        budget = self.max_points - len(x)
+        if (budget <= 0) or (len(x) < 3) or (len(self._features) == 0):
+            return np.array([])
+
+        error = self._get_interval_errors()
+        error[np.diff(x) < self.min_width] = 0.0
+        candidates = np.where(error > self.tolerance)[0]
+        if len(candidates) == 0:
+            return np.array([])
+        # largest errors first, if the budget is exceeded
+        candidates = candidates[np.argsort(error[candidates])[::-1]][:budget]
+
+        new_values = np.sort(0.5*(x[candidates] + x[candidates+1]))
+        self.variable = np.sort(np.concatenate((x, new_values)))
+        return new_values
+
+    def _get_interval_errors(self) -> np.ndarray:
+        """
+        Error estimate per interval, scaled so that it is compared to `tolerance`.
+        Intervals next to failed values (NaN) are not refined.
+        """
+        x = self.variable
+        dim = len(next(iter(self._features.values())))
+        missing = np.full(dim, np.nan)
+        Y = np.array([self._features.get(float(v), missing) for v in x])
+
+        change = np.nan_to_num(np.abs(np.diff(Y, axis=0)), nan=0.0).max(axis=1)
+        error = change/self.change_factor
+
+        w = (x[1:-1] - x[:-2])/(x[2:] - x[:-2])
+        chord = Y[:-2] + w[:, np.newaxis]*(Y[2:] - Y[:-2])
+        deviation = np.nan_to_num(np.abs(Y[1:-1] - chord), nan=0.0).max(axis=1)
+        error[:-1] = np.maximum(error[:-1], deviation)
+        error[1:] = np.maximum(error[1:], deviation)
+        return error
@@ -1,6 +1,7 @@
 
 from threading import Event, Lock, Thread
 from queue import Queue
+from typing import Optional
 import numpy as np
 import logging
 import logging.handlers
@@ -11,8 +12,11 @@ from source.parameter_controller import ParameterControl
 from source.hoe_in_loop import HoeInLoop
 from source.data_container import DataContainer
 from source.store_controller import StoreController
+from source.job_scheduler import JobScheduler
+from source.result_cache import ResultCache
 
 from rcwa.rcwa_exception import RCWAError
+from rcwa.stage_timing import StageTimer, collect_stage_timing
 
 
 class AppController:
@@ -20,7 +24,16 @@ class AppController:
     Manages the execution, data handling, and control flow of the volume hologram simulation.
     """
     
-    def __init__(self):
+    def __init__(self, log_stage_timing: bool = False, scheduler: JobScheduler = None, result_cache: ResultCache = None):
+        """
+        Args:
+            log_stage_timing (bool, optional): Logs the time, calls and peak memory of the solver
+                stages after each sweep. Slows the simulation down. Defaults to False.
+            scheduler (JobScheduler, optional): Queues the simulations and computes them in its
+                worker processes. Defaults to None, the simulation runs in an own thread.
+            result_cache (ResultCache, optional): Results of values computed before are taken from
+                the cache, new results are added. Defaults to None, all values are computed.
+        """
         self.parameter_control: ParameterControl = ParameterControl()
         self.store_controller: StoreController = StoreController()
 
@@ -36,9 +49,14 @@ class AppController:
         self._is_running: bool = False
         self._new_data: bool = False
         self._data: DataContainer = None       
+        self._changed_indices: set[int] = set()
                 
         self._hoe_in_loop: HoeInLoop = None
         self._variables: np.ndarray = None
+        self.log_stage_timing: bool = log_stage_timing
+        self._stage_timer: StageTimer = None
+        self.scheduler: JobScheduler = scheduler
+        self.result_cache: ResultCache = result_cache
 
         self._prepare_logger()
 
@@ -76,6 +94,10 @@ class AppController:
             if (transfer.get("running") is not None): self._is_running = transfer["running"]
             if (transfer.get("Progress") is not None): self._progress = transfer["Progress"]                
             if (transfer.get("new_data") is not None): self._new_data = transfer["new_data"]
+            if (transfer.get("variable") is not None) and (self._data is not None): 
+                # refinement of an adaptive sweep, the indices of the values change
+                self._data.set_variable(transfer["variable"])
+                self._new_data = True
 
             Rs = transfer.get("Rs")
             Rp = transfer.get("Rp")
@@ -85,6 +107,7 @@ class AppController:
             if i is not None:
                 if self._data is not None:
                     self._data.insert_data(i, Rs, Rp, Ts, Tp)
+                    self._changed_indices.add(i)
 
     def get_updated_plotting_data_and_status(self, rs, rp, ts, tp, es, ep, hx, hy, ask_for_plot_data):
         """
@@ -106,28 +129,103 @@ class AppController:
             self._transfer_data_from_queue()
             plot_data = None
             store_new = self.store_controller.new_data
-            if ask_for_plot_data or self._new_data or store_new:
-                if self._data is None:
-                    plot_data = list()
-                else:                    
-                    plot_data = self._data.get_plot_data(rs,rp, ts, tp, es, ep, hx, hy)
-                store_plots = self.store_controller.get_plot_data(rs,rp, ts, tp, es, ep, hx, hy)
-                plot_data = plot_data + store_plots
+            changed = len(self._changed_indices) != 0
+            if ask_for_plot_data or self._new_data or store_new or changed:
+                plot_data = self._get_all_plot_data(rs,rp, ts, tp, es, ep, hx, hy)
             self._new_data = False
+            self._changed_indices = set()
             self.store_controller.new_data = False
             return (self._is_running, self._progress, plot_data)
+
+    def get_incremental_plotting_data_and_status(self, rs, rp, ts, tp, es, ep, hx, hy, ask_for_plot_data):
+        """
+        Incremental version of `get_updated_plotting_data_and_status`.
+
+        All traces are only returned, if they changed (new or stopped simulation, store, 
+        selection, checkboxes or order). Otherwise only the values of the running simulation, 
+        computed since the last call, are returned. The traces of the running simulation are 
+        the first traces of the plot data and their y values are lists, so single points 
+        of the figure can be replaced.
+
+        Returns:
+            tuple: (is_running, progress, plot_data, plot_updates) or None if locked.
+                plot_data is the list of all traces or None. 
+                plot_updates is None or (indices, values), values[k] are the new y values of trace k.
+        """
+        if self._lock_data.locked():
+            self.logger.debug("Data are locked")
+            return None
+        
+        with self._lock_data:
+            self._transfer_data_from_queue()
+            plot_data = None
+            plot_updates = None
+            store_new = self.store_controller.new_data
+            if ask_for_plot_data or self._new_data or store_new:
+                plot_data = self._get_all_plot_data(rs,rp, ts, tp, es, ep, hx, hy)
+            elif (len(self._changed_indices) != 0) and (self._data is not None):
+                indices = sorted(self._changed_indices)
+                values = self._data.get_plot_values(indices, rs,rp, ts, tp, es, ep, hx, hy)
+                plot_updates = (indices, values)
+            self._new_data = False
+            self._changed_indices = set()
+            self.store_controller.new_data = False
+            return (self._is_running, self._progress, plot_data, plot_updates)
+
+    def _get_all_plot_data(self, rs, rp, ts, tp, es, ep, hx, hy) -> list[dict]:
+        if self._data is None:
+            plot_data = list()
+        else:                    
+            plot_data = self._data.get_plot_data(rs,rp, ts, tp, es, ep, hx, hy)
+            for plot in plot_data:
+                plot["y"] = plot["y"].tolist()
+        store_plots = self.store_controller.get_plot_data(rs,rp, ts, tp, es, ep, hx, hy)
+        return plot_data + store_plots
         
     def start_stop_calculation(self):
         """
         Starts or stops the simulation process. 
         """
-        if self._thread_loop is not None and self._thread_loop.is_alive():
+        if self._is_loop_active():
+            if (self.scheduler is not None) and self.scheduler.cancel(self):
+                # the simulation was queued and has not started
+                transfer = dict()
+                transfer["running"] = False
+                transfer["new_data"] = True
+                self._task_queue.put(transfer)
+                self.logger.info("Simulation stopped!")
+                return False
             self._stop_loop_event.set()
             self.logger.info("Simulation will be stopped")
             return False
         self._thread_loop = None
+        self._stop_loop_event.clear()
         self._prepare_calculation()
 
+    def get_queue_position(self) -> Optional[int]:
+        """
+        Position of the simulation in the queue of the scheduler, 1 is started next.
+        None, if the simulation is not queued.
+        """
+        if self.scheduler is None:
+            return None
+        position = self.scheduler.get_queue_position(self)
+        return position if position != 0 else None
+
+    def close(self):
+        """
+        Stops a queued or running simulation and closes the store.
+        """
+        if self.scheduler is not None:
+            self.scheduler.cancel(self)
+        self._stop_loop_event.set()
+        self.store_controller.close()
+
+    def _is_loop_active(self) -> bool:
+        if self.scheduler is not None:
+            return self.scheduler.is_active(self)
+        return self._thread_loop is not None and self._thread_loop.is_alive()
+
     def _prepare_calculation(self):
         """
         Prepare and starts a new simulation loop.
@@ -140,8 +238,11 @@ class AppController:
                 self._progress = 0                
                 self._hoe_in_loop = HoeInLoop(self.parameter_control)                
                 self._task_queue = Queue()                
-                self._data = self._hoe_in_loop.get_start_value_container()                                 
+                # with the scheduler, the solver work of the initialization is done in its workers
+                self._data = self._hoe_in_loop.get_start_value_container(initialize=self.scheduler is None)                                 
                 self._variables = self._data.variable   
+                self._changed_indices = set()
+                self._new_data = True
             except Exception as e:
                 self._is_running = False
                 self._progress = 0
@@ -156,6 +257,12 @@ class AppController:
                     self.logger.error("Traceback:", exc_info=True)                
                 return 
 
+        if self.scheduler is not None:
+            self.scheduler.submit(self, self._simulation_loop)
+            position = self.scheduler.get_queue_position(self)
+            if position:
+                self.logger.info(f"Simulation queued at position {position}")
+            return
         self._thread_loop = Thread(target=self._simulation_loop, daemon=True)
         self._thread_loop.start()
       
@@ -163,37 +270,25 @@ class AppController:
         """
         Runs the main simulation loop, iterating over all variable values and computing the results.
         """
-        variable = self._variables
-        dim = len(variable)
         self.logger.info("Start simulation")  
-        for i in range(dim):
-            if self._stop_loop_event.is_set():
-                transfer = dict()
-                transfer["running"] = False                
-                transfer["new_data"] = True
-                self._task_queue.put(transfer)
-                self._transfer_data_from_queue()
-                self._stop_loop_event.clear()
-                self.logger.info("Simulation stopped!")
-                return
-            else:   
-                v = variable[i]                         
-                try:                    
-                    Rs, Rp, Ts, Tp = self._hoe_in_loop.get_Rs_Rp_Ts_Tp(v)           
-                    transfer = dict()
-                    transfer["Rs"] = Rs
-                    transfer["Rp"] = Rp
-                    transfer["Ts"] = Ts
-                    transfer["Tp"] = Tp
-                    transfer["i"] = i
-                    transfer["running"] = True
-                    transfer["new_data"] = True
-                    transfer["Progress"] = int(100*i/dim)            
-                    self._task_queue.put(transfer) 
-                except Exception as e:                    
-                    message = e.args[0]
-                    self.logger.warning(f"Simulation value {v} can not be calculated. Exception type {type(e)}: "+ message)
-                   
+        if self.log_stage_timing:
+            with collect_stage_timing(trace_memory=True) as timer:
+                self._stage_timer = timer
+                finished = self._run_sweep()
+            self._stage_timer = None
+            self.logger.info("Stage timing of the solver:\n" + timer.report())
+        else:
+            finished = self._run_sweep()
+
+        if not finished:
+            transfer = dict()
+            transfer["running"] = False                
+            transfer["new_data"] = True
+            self._task_queue.put(transfer)
+            self._transfer_data_from_queue()
+            self._stop_loop_event.clear()
+            self.logger.info("Simulation stopped!")
+            return
 
         transfer = dict()
         transfer["running"] = False
@@ -204,6 +299,123 @@ class AppController:
             self._transfer_data_from_queue()
         self.logger.info("Simulation finished!")
 
+    def _run_sweep(self) -> bool:
+        if self._hoe_in_loop.is_adaptive:
+            return self._run_sweep_adaptive()
+        return self._run_sweep_values(self._variables)
+
+    def _run_sweep_values(self, variable: np.ndarray) -> bool:
+        """
+        Computes the sweep values (see `_iter_sweep_values`) in the order they are computed. 
+        Returns False, if the simulation was stopped.
+        """
+        dim = len(variable)
+        done = 0
+        for i, v, result, e in self._iter_sweep_values(variable):
+            done += 1
+            if e is not None:
+                self._log_failed_value(v, e)
+                continue
+            Rs, Rp, Ts, Tp = result
+            self._put_result(i, Rs, Rp, Ts, Tp, int(100*done/dim))
+        return not self._stop_loop_event.is_set()
+
+    def _run_sweep_adaptive(self) -> bool:
+        """
+        Computes the coarse grid and refines it in rounds, until the `AdaptiveSampler` is converged.
+        The progress refers to the values known so far. Returns False, if the simulation was stopped.
+        """
+        sampler = self._hoe_in_loop.create_adaptive_sampler()
+        values = sampler.variable
+        done = 0
+        while len(values) != 0:
+            for _, v, result, e in self._iter_sweep_values(values):
+                done += 1
+                if e is not None:
+                    self._log_failed_value(v, e)
+                    continue
+                Rs, Rp, Ts, Tp = result
+                sampler.add_result(v, Rs, Rp, Ts, Tp)
+                self._put_result(sampler.get_index(v), Rs, Rp, Ts, Tp, int(100*done/len(sampler.variable)))
+            if self._stop_loop_event.is_set():
+                return False
+            values = sampler.refine()
+            if len(values) != 0:
+                transfer = dict()
+                transfer["variable"] = sampler.variable.copy()
+                self._task_queue.put(transfer)
+        self.logger.info(f"Adaptive sweep finished with {len(sampler.variable)} values")
+        return True
+
+    def _iter_sweep_values(self, values: np.ndarray):
+        """
+        Results of the values as (i, value, (Rs, Rp, Ts, Tp) or None, exception or None).
+        The cached values come first, the missing values are computed and added to the cache.
+        Ends early, if the simulation is stopped.
+        """
+        if self.result_cache is None:
+            yield from self._iter_computed_values(values)
+            return
+        keys = [self._hoe_in_loop.get_cache_key(v) for v in values]
+        results = [self.result_cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if (len(missing) != 0) and not self._hoe_in_loop.is_parallelizable:
+            # the cycle thickness calculation adds one cycle per value, all values are computed
+            missing = list(range(len(values)))
+        cached = len(values) - len(missing)
+        if cached != 0:
+            self.logger.info(f"{cached} of {len(values)} values are taken from the result cache")
+        missing_set = set(missing)
+        for i, result in enumerate(results):
+            if i in missing_set:
+                continue
+            if self._stop_loop_event.is_set():
+                return
+            yield i, values[i], result, None
+        if len(missing) == 0:
+            return
+        for j, v, result, e in self._iter_computed_values(values[missing]):
+            i = missing[j]
+            if e is None:
+                self.result_cache.put(keys[i], *result)
+            yield i, v, result, e
+
+    def _iter_computed_values(self, values: np.ndarray):
+        """
+        Results of the values like `_iter_sweep_values`, computed by the scheduler or 
+        one after another in this thread.
+        """
+        if self.scheduler is not None:
+            if self._hoe_in_loop.is_parallelizable:
+                yield from self.scheduler.map_values(self._hoe_in_loop, values, self._stop_loop_event, self._stage_timer)
+            else:
+                yield from self.scheduler.run_sequential(self._hoe_in_loop, values, self._stop_loop_event, self._stage_timer)
+            return
+        for i, v in enumerate(values):
+            if self._stop_loop_event.is_set():
+                return
+            try:
+                result = self._hoe_in_loop.get_Rs_Rp_Ts_Tp(v)
+            except Exception as e:
+                yield i, v, None, e
+            else:
+                yield i, v, result, None
+
+    def _put_result(self, i, Rs, Rp, Ts, Tp, progress):
+        transfer = dict()
+        transfer["Rs"] = Rs
+        transfer["Rp"] = Rp
+        transfer["Ts"] = Ts
+        transfer["Tp"] = Tp
+        transfer["i"] = i
+        transfer["running"] = True
+        transfer["Progress"] = progress            
+        self._task_queue.put(transfer) 
+
+    def _log_failed_value(self, v, e: Exception):
+        message = str(e.args[0]) if len(e.args) != 0 else ""
+        self.logger.warning(f"Simulation value {v} can not be calculated. Exception type {type(e)}: "+ message)
+
     def _prepare_logger(self):
         log_queue = self.log_queue
         logger = self.logger
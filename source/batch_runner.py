@@ -0,0 +1,242 @@
+from threading import Event
+from typing import Iterator, TextIO
+import numpy as np
+import logging
+import json
+import os
+from logging import Logger
+
+from source.parameter_controller import ParameterControl
+from source.hoe_in_loop import HoeInLoop
+from source.data_container import DataContainer
+from source.sweep_executor import SweepExecutor
+
+
+def load_sweep_specs(path: str) -> list[dict]:
+    """
+    Reads the sweeps of a JSON or YAML spec file.
+
+    The file contains one sweep or a dict with a list "sweeps". Parameters given
+    at the top level of the file are used for all sweeps of the file,
+    the parameters of a sweep take precedence.
+
+    Example:
+        {
+            "parameters": {"n0": 1.5, "dn": 0.02, "harmonic_order": 3},
+            "sweeps": [
+                {"name": "theta_scan", "variable": "theta", "start": -10, "end": 10, "steps": 201},
+                {"name": "lam_scan", "variable": "lam", "start": 0.45, "end": 0.55, "steps": 101,
+                 "parameters": {"theta": 5.0}, "output": "lam_scan.jsonl"}
+            ]
+        }
+
+    Returns:
+        list[dict]: One dict per sweep with the merged "parameters".
+    """
+    with open(path, "r") as file:
+        if os.path.splitext(path)[1].lower() in [".yaml", ".yml"]:
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("Reading YAML spec files requires PyYAML, use a JSON spec file instead")
+            spec = yaml.safe_load(file)
+        else:
+            spec = json.load(file)
+
+    if "sweeps" not in spec:
+        return [spec]
+
+    common_parameters = spec.get("parameters", dict())
+    sweeps = list()
+    for sweep in spec["sweeps"]:
+        sweep = dict(sweep)
+        parameters = dict(common_parameters)
+        parameters.update(sweep.get("parameters", dict()))
+        sweep["parameters"] = parameters
+        sweeps.append(sweep)
+    return sweeps
+
+
+def create_parameter_control(sweep: dict) -> ParameterControl:
+    """
+    Builds the `ParameterControl` of a sweep spec, the names are the parameter names of the GUI.
+    """
+    parameter_control = ParameterControl()
+    hoe_parameters = parameter_control.hoe_parameters
+
+    variable = sweep["variable"]
+    if variable not in parameter_control.get_list_of_variable_parameters():
+        raise ValueError(f"{variable} can not be used as variable parameter")
+
+    for name, value in sweep.get("parameters", dict()).items():
+        if name not in hoe_parameters:
+            raise ValueError(f"Unknown parameter: {name}")
+        hoe_parameters[name].value = value
+
+    parameter_control.current_variable = variable
+    start, end, steps = parameter_control.get_variable_range(variable)
+    start = sweep.get("start", start)
+    end = sweep.get("end", end)
+    steps = sweep.get("steps", steps)
+    parameter_control.set_variable_range(variable, start, end, steps)
+    return parameter_control
+
+
+def read_batch_output(path: str) -> DataContainer:
+    """
+    Collects the slices of an output file written by `BatchRunner` in a `DataContainer`.
+    Missing slices (failed or not yet computed values) are NaN. The slices are placed by their
+    value, the values of adaptive sweeps are added to the variable of the header.
+    """
+    header = None
+    slices = list()
+    with open(path, "r") as file:
+        for line in file:
+            record = json.loads(line)
+            if record["type"] == "header":
+                header = record
+            elif record["type"] == "slice":
+                slices.append(record)
+
+    values = [record["value"] for record in slices]
+    variable = np.unique(np.concatenate((header["variable"], values)))
+    data = DataContainer.create_empty(header["dimX"], header["dimY"], len(variable), variable, header["parameter_text"], header["pram_variable"])
+    data.name = header["name"]
+    for record in slices:
+        Rs = np.array(record["Rs"])
+        Rp = np.array(record["Rp"])
+        Ts = np.array(record["Ts"])
+        Tp = np.array(record["Tp"])
+        data.insert_data(int(np.searchsorted(variable, record["value"])), Rs, Rp, Ts, Tp)
+    return data
+
+
+class BatchRunner:
+    """
+    Runs sweeps without the GUI and streams the results to JSON lines files.
+
+    The first line of an output file describes the `DataContainer` of the sweep (header),
+    every further line holds the Rs, Rp, Ts, Tp slice of one computed value.
+    The slices are written in completion order and flushed, so a file can be read with
+    `read_batch_output` while the sweep is running. For adaptive sweeps, the header holds the 
+    coarse grid and the refined values follow as further slices.
+    """
+
+    def __init__(self, output_dir: str = ".", sweep_workers: int = None):
+        """
+        Args:
+            output_dir (str): Directory for outputs without explicit path.
+            sweep_workers (int, optional): Number of worker processes for independent sweep points.
+                Defaults to the number of CPUs, 1 runs the sweep in the calling process.
+        """
+        self.output_dir: str = output_dir
+        self.sweep_workers: int = sweep_workers if sweep_workers is not None else os.cpu_count()
+        self.logger: Logger = logging.getLogger("Hologram_batch_logger")
+        self._stop_event: Event = Event()
+
+    def run_all(self, sweeps: list[dict]) -> list[str]:
+        """
+        Runs the sweeps one after another. A failed sweep is logged and the next one is started.
+
+        Returns:
+            list[str]: Output files of the finished sweeps.
+        """
+        outputs = list()
+        for sweep in sweeps:
+            try:
+                outputs.append(self.run(sweep))
+            except Exception as e:
+                self.logger.error(f"Sweep {sweep.get('name')} failed: {type(e).__name__} - {e}")
+        return outputs
+
+    def run(self, sweep: dict) -> str:
+        """
+        Runs one sweep and returns the path of the output file.
+        """
+        name = sweep.get("name", sweep["variable"])
+        path = sweep.get("output", name+".jsonl")
+        if not os.path.isabs(path):
+            path = os.path.join(self.output_dir, path)
+
+        parameter_control = create_parameter_control(sweep)
+        hoe_in_loop = HoeInLoop(parameter_control)
+        data = hoe_in_loop.get_start_value_container()
+        data.name = name
+        variable = data.variable
+
+        self.logger.info(f"Start sweep {name}: {len(variable)} values of {data.pram_variable}")
+        failed = 0
+        written = 0
+        with open(path, "w") as file:
+            self._write_record(file, self._header_record(data, hoe_in_loop))
+            for i, v, result, e in self._iter_sweep(hoe_in_loop, variable):
+                if e is not None:
+                    failed += 1
+                    message = str(e.args[0]) if len(e.args) != 0 else ""
+                    self.logger.warning(f"Simulation value {v} can not be calculated. Exception type {type(e)}: "+ message)
+                    continue
+                Rs, Rp, Ts, Tp = result
+                self._write_record(file, self._slice_record(i, v, Rs, Rp, Ts, Tp))
+                written += 1
+        self.logger.info(f"Sweep {name} finished, {written} of {written+failed} values written to {path}")
+        return path
+
+    def _iter_sweep(self, hoe_in_loop: HoeInLoop, variable: np.ndarray) -> Iterator[tuple]:
+        if not hoe_in_loop.is_adaptive:
+            yield from self._iter_values(hoe_in_loop, variable)
+            return
+
+        sampler = hoe_in_loop.create_adaptive_sampler()
+        values = sampler.variable
+        while len(values) != 0:
+            for i, v, result, e in self._iter_values(hoe_in_loop, values):
+                if e is None:
+                    sampler.add_result(v, *result)
+                    i = sampler.get_index(v)
+                yield i, v, result, e
+            values = sampler.refine()
+        self.logger.info(f"Adaptive sweep finished with {len(sampler.variable)} values")
+
+    def _iter_values(self, hoe_in_loop: HoeInLoop, variable: np.ndarray) -> Iterator[tuple]:
+        use_executor = (self.sweep_workers is not None) and (self.sweep_workers >= 2) and (len(variable) >= 2)
+        if use_executor and hoe_in_loop.is_parallelizable:
+            executor = SweepExecutor(hoe_in_loop, self.sweep_workers)
+            yield from executor.run(variable, self._stop_event)
+            return
+
+        for i, v in enumerate(variable):
+            try:
+                result = hoe_in_loop.get_Rs_Rp_Ts_Tp(v)
+            except Exception as e:
+                yield i, v, None, e
+            else:
+                yield i, v, result, None
+
+    @staticmethod
+    def _header_record(data: DataContainer, hoe_in_loop: HoeInLoop) -> dict:
+        record = dict()
+        record["type"] = "header"
+        record["name"] = data.name
+        record["pram_variable"] = data.pram_variable
+        record["parameter_text"] = data.parameter_text
+        record["variable"] = data.variable.tolist()
+        record["dimX"] = hoe_in_loop.dimX
+        record["dimY"] = hoe_in_loop.dimY
+        return record
+
+    @staticmethod
+    def _slice_record(i: int, v: float, Rs: np.ndarray, Rp: np.ndarray, Ts: np.ndarray, Tp: np.ndarray) -> dict:
+        record = dict()
+        record["type"] = "slice"
+        record["i"] = int(i)
+        record["value"] = float(v)
+        record["Rs"] = np.asarray(Rs).tolist()
+        record["Rp"] = np.asarray(Rp).tolist()
+        record["Ts"] = np.asarray(Ts).tolist()
+        record["Tp"] = np.asarray(Tp).tolist()
+        return record
+
+    @staticmethod
+    def _write_record(file: TextIO, record: dict) -> None:
+        file.write(json.dumps(record)+"\n")
+        file.flush()
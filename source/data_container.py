@@ -1,5 +1,8 @@
 import numpy as np
 import json
+import io
+import zipfile
+import os
 from numbers import Number
 
 
@@ -57,6 +60,84 @@ class DataContainer:
         data = json.loads(json_str)
         return DataContainer.from_dict(data)  
 
+    def to_npz(self) -> bytes:
+        """
+        Binary format: the value cubes and the variable are stored as raw arrays in an .npz file,
+        the metadata as string arrays. Much smaller and faster than `to_json`.
+        """
+        buffer = io.BytesIO()
+        np.savez(buffer,
+                 Rs_values=self.Rs_values,
+                 Rp_values=self.Rp_values,
+                 Ts_values=self.Ts_values,
+                 Tp_values=self.Tp_values,
+                 variable=self.variable,
+                 color=np.array(self.color),
+                 name=np.array(self.name),
+                 parameter_text=np.array(self.parameter_text),
+                 pram_variable=np.array(self.pram_variable))
+        return buffer.getvalue()
+
+    @staticmethod
+    def from_npz(npz_bytes: bytes) -> "DataContainer":
+        container = DataContainer()
+        with np.load(io.BytesIO(npz_bytes), allow_pickle=False) as data:
+            container.Rs_values = data["Rs_values"]
+            container.Rp_values = data["Rp_values"]
+            container.Ts_values = data["Ts_values"]
+            container.Tp_values = data["Tp_values"]
+            container.variable = data["variable"]
+            container.color = str(data["color"])
+            container.name = str(data["name"])
+            container.parameter_text = str(data["parameter_text"])
+            container.pram_variable = str(data["pram_variable"])
+        return container
+
+    def to_memory_map(self, directory: str) -> "DataContainer":
+        """
+        Writes the value cubes to .npy files in `directory` and returns a copy of the container,
+        which holds read-only memory maps of these files instead of the arrays.
+        """
+        container = DataContainer()
+        for key in ["Rs_values", "Rp_values", "Ts_values", "Tp_values"]:
+            path = os.path.join(directory, key+".npy")
+            np.save(path, getattr(self, key))
+            setattr(container, key, np.load(path, mmap_mode="r"))
+        container.variable = self.variable.copy()
+        container.color = self.color
+        container.name = self.name
+        container.parameter_text = self.parameter_text
+        container.pram_variable = self.pram_variable
+        return container
+
+    def close_memory_maps(self) -> None:
+        """
+        Closes the memory maps of `to_memory_map`, so their files can be deleted 
+        (Windows can not delete mapped files). The value cubes are None afterwards.
+        """
+        for key in ["Rs_values", "Rp_values", "Ts_values", "Tp_values"]:
+            values = getattr(self, key)
+            setattr(self, key, None)
+            mmap = getattr(values, "_mmap", None)
+            del values
+            if mmap is not None:
+                try:
+                    mmap.close()
+                except BufferError:
+                    # views of the values are still used, the map is closed with the last view
+                    pass
+
+    @staticmethod
+    def is_npz(file_bytes: bytes) -> bool:
+        """
+        True, if the bytes are a `to_npz` file. These are zip files containing Rs_values.npy.
+        """
+        try:
+            with zipfile.ZipFile(io.BytesIO(file_bytes), "r") as zip_file:
+                return "Rs_values.npy" in zip_file.namelist()
+        except zipfile.BadZipFile:
+            return False
+
     
     def get_dim(self) -> int:
         return len(self.variable)
@@ -67,6 +148,20 @@ class DataContainer:
         self.Ts_values[:,:,i] = Ts
         self.Tp_values[:,:,i] = Tp
 
+    def set_variable(self, variable: np.ndarray) -> None:
+        """
+        Changes the variable to the sorted values `variable`, which contain all current values, 
+        e.g. after a refinement of an adaptive sweep. The stored values are moved to 
+        the positions of their variable values, the new positions are NaN.
+        """
+        positions = np.searchsorted(variable, self.variable)
+        for key in ["Rs_values", "Rp_values", "Ts_values", "Tp_values"]:
+            values = getattr(self, key)
+            new_values = np.full(values.shape[:2]+(len(variable),), np.nan)
+            new_values[:,:,positions] = values
+            setattr(self, key, new_values)
+        self.variable = np.array(variable, dtype=float)
+
     def get_i_variable(self, i) -> Number:
         return self.variable[i]
     
@@ -104,8 +199,30 @@ class DataContainer:
         return data_list
 
 
+    def get_plot_values(self, indices: list[int], add_rs, add_rp, add_ts, add_tp, add_es, add_ep, order_x, order_y) -> list[np.ndarray]:
+        """
+        y values at the sweep `indices` of the traces of `get_plot_data`, in the same order.
+        Used to update a plot with new values without rebuilding the traces.
+        """
+        indices = np.asarray(indices, dtype=int)
+        values_list = []
+        if add_rs:
+            values_list.append(self._get_hx_hy_order_of_values(self.Rs_values, order_x, order_y)[indices])
+        if add_rp:
+            values_list.append(self._get_hx_hy_order_of_values(self.Rp_values, order_x, order_y)[indices])
+        if add_ts:
+            values_list.append(self._get_hx_hy_order_of_values(self.Ts_values, order_x, order_y)[indices])
+        if add_tp:
+            values_list.append(self._get_hx_hy_order_of_values(self.Tp_values, order_x, order_y)[indices])
+        if add_es:
+            values_list.append(np.sum(self.Ts_values[:,:,indices], axis=(0,1)) + np.sum(self.Rs_values[:,:,indices], axis=(0,1)))
+        if add_ep:
+            values_list.append(np.sum(self.Tp_values[:,:,indices], axis=(0,1)) + np.sum(self.Rp_values[:,:,indices], axis=(0,1)))
+        return values_list
+
     def _get_plot_dict_energy_s(self, name: str):
-        y = np.sum(self.Ts_values + self.Rs_values, axis=(0,1))
+        # Summed separately, no temporary copy of the (memory mapped) cubes
+        y = np.sum(self.Ts_values, axis=(0,1)) + np.sum(self.Rs_values, axis=(0,1))
         plot = dict()
         plot["x"] = self.variable.copy()
         plot["y"] = y
@@ -116,7 +233,7 @@ class DataContainer:
         return plot
     
     def _get_plot_dict_energy_p(self, name: str):
-        y = np.sum(self.Tp_values + self.Rp_values, axis=(0,1))
+        y = np.sum(self.Tp_values, axis=(0,1)) + np.sum(self.Rp_values, axis=(0,1))
         plot = dict()
         plot["x"] = self.variable.copy()
         plot["y"] = y
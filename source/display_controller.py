@@ -1,4 +1,6 @@
 import plotly.graph_objs as go
+import numpy as np
+from dash import Patch, no_update
 
 
 def build_dummy_graph(text: str):
@@ -42,6 +44,20 @@ def build_graph(figure_before: go.Figure, plot_data: list[dict], pram_variable):
     )               
     return figure
 
+def build_graph_patch(plot_updates: tuple):
+    """
+    Patch, which replaces the new y values of the first traces, or no_update.
+    plot_updates is None or (indices, values) with values[k] for trace k.
+    """
+    if plot_updates is None:
+        return no_update
+    indices, values = plot_updates
+    patch = Patch()
+    for k, y in enumerate(values):
+        for i, v in zip(indices, y):
+            patch["data"][k]["y"][i] = None if np.isnan(v) else float(v)
+    return patch
+
 def filter_and_get_pram_variables(plot_data: list[dict]) -> list[str]:
     pram_variables = list()
     if plot_data is None:
@@ -3,10 +3,13 @@ from typing import Union
 
 from source.parameter_controller import ParameterControl
 from source.data_container import DataContainer
+from source.adaptive_sampler import AdaptiveSampler
+from source.result_cache import ResultCache
 
 
 from rcwa.volume_hologram_3D import VolumeHologram3D
 from rcwa.hoe_thickness_dependence import HOEThicknessDependence
+from rcwa.rcwa_exception import RCWAError
 
 
 class HoeInLoop:
@@ -26,19 +29,32 @@ class HoeInLoop:
         
         self._hoe: Union[VolumeHologram3D, HOEThicknessDependence] = None
         self._is_HOEThicknessDependence: bool = None
+        # (thickness, max_steps) of a cycle thickness calculation that is not initialized yet
+        self._pending_cycle_calculation: tuple = None
         
         self._set_hoe()
         self._fill_parameter_to_hoe()
 
-    def get_start_value_container(self) -> DataContainer:        
+    def get_start_value_container(self, initialize: bool = True) -> DataContainer:
+        """
+        Empty container of the sweep values. 
+
+        With `initialize`, the cycle thickness calculation is initialized as well. Otherwise
+        `initialize_calculation` has to be called before the first value, e.g. in the process
+        that computes the values.
+        """
         if not self._is_HOEThicknessDependence:
             variable = self.parameter_control.get_current_variable_values()
         else:
             thickness, max_steps, _ = self.parameter_control.get_variable_range(self.current_variable)
             one_cycle_length = self._hoe.get_cycle_length_z_direction()
             steps = self._hoe.get_cycle_count_for_thickness(thickness)
+            if (max_steps is not None) and (steps > max_steps):
+                raise RCWAError("Too many steps for this thickness", "Increase max_steps")
             variable = (np.arange(steps+1))*one_cycle_length                                
-            self._hoe.initialize_cycle_calculation(thickness, max_steps)
+            self._pending_cycle_calculation = (thickness, max_steps)
+            if initialize:
+                self.initialize_calculation()
         
         dimX = int(2*self._hoe.harmonic_order+1)
         dimY = 1
@@ -52,12 +68,56 @@ class HoeInLoop:
         return data
     
 
+    def initialize_calculation(self) -> None:
+        """
+        Computes the scatter matrices of one cycle for the cycle thickness calculation, 
+        if they are not computed yet. Does nothing for the other variables.
+        """
+        if self._pending_cycle_calculation is None:
+            return
+        thickness, max_steps = self._pending_cycle_calculation
+        self._hoe.initialize_cycle_calculation(thickness, max_steps)
+        self._pending_cycle_calculation = None
+
+    @property
+    def is_adaptive(self) -> bool:
+        return self.parameter_control.is_adaptive
+
+    def create_adaptive_sampler(self) -> AdaptiveSampler:
+        """
+        Sampler of the adaptive sweep, its coarse grid are the values of `get_start_value_container`.
+        """
+        start, end, steps = self.parameter_control.get_variable_range(self.current_variable)
+        tolerance = self.parameter_control.adaptive_tolerance
+        max_points = self.parameter_control.adaptive_max_points
+        return AdaptiveSampler(start, end, steps, tolerance, max_points)
+
+    @property
+    def is_parallelizable(self) -> bool:
+        """
+        The sweep points are independent, except for the cycle thickness calculation, 
+        which adds one cycle per step.
+        """
+        return not self._is_HOEThicknessDependence
+
     def get_Rs_Rp_Ts_Tp(self, value):    
         if self._is_HOEThicknessDependence:
             return self._get_Rs_Rp_Ts_Tp_HOEThicknessDependence(value)
         else:
             return self._get_Rs_Rp_Ts_Tp_VolumeHologram3D(value)
     
+    def get_cache_key(self, value) -> str:
+        """
+        Key of the result of `value` in the `ResultCache`, a hash of all parameters of the 
+        hologram, the variable and the value. The value is rounded to 12 digits, so the values 
+        of sweeps with other ranges are found as well.
+        """
+        parameters = list()
+        for key, pram in self._hoe_parameters.items():
+            if (pram.attribute_name is not None) and (key != self.current_variable):
+                parameters.append((pram.attribute_name, pram.value))
+        return ResultCache.create_key(sorted(parameters), self.current_variable, f"{float(value):.12g}")
+
     def _get_error_values(self):
         error_value = np.full((self.dimY, self.dimX), np.nan)
         return error_value, error_value, error_value, error_value
@@ -108,6 +168,10 @@ class HoeInLoop:
         label_steps = pram_current.label_steps
 
         text += f"{label_start}: {start}, {label_end}: {end}, {label_steps}: {steps}\n"
+        if self.is_adaptive:
+            tolerance = self.parameter_control.adaptive_tolerance
+            max_points = self.parameter_control.adaptive_max_points
+            text += f"Adaptive sweep, tolerance: {tolerance}, max points: {max_points}\n"
         for item in self._hoe_parameters.items():
               key = item[0]
               value = item[1].value
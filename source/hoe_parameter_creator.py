@@ -96,4 +96,17 @@ def create_hoe_parameter():
     hoe_parameters["n_z"] = nz
     hoe_parameters["nz_steps_per_cycle"] = nz_steps_per_cycle
     hoe_parameters["harmonic_order"] = harmonic
+
+    # Adaptive sweep, not a parameter of the hologram. A tolerance of 0 gives the uniform grid
+    adaptive_tolerance = ParameterFloat(0.0)
+    adaptive_max_points = ParameterInt(2000)
+
+    adaptive_tolerance.is_variable = False
+    adaptive_max_points.is_variable = False
+
+    adaptive_tolerance.v_min = 0.0
+    adaptive_max_points.v_min = 2
+
+    hoe_parameters["adaptive_tolerance"] = adaptive_tolerance
+    hoe_parameters["adaptive_max_points"] = adaptive_max_points
     return hoe_parameters
\ No newline at end of file
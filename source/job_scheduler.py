@@ -0,0 +1,260 @@
+from concurrent.futures import ProcessPoolExecutor, Future, FIRST_COMPLETED, wait
+from collections import OrderedDict, deque
+from threading import Condition, Event, Thread
+from typing import Callable, Hashable, Iterator, Optional
+import numpy as np
+import multiprocessing
+import logging
+import pickle
+import math
+import os
+import uuid
+
+from source.hoe_in_loop import HoeInLoop
+from rcwa.stage_timing import StageTimer, collect_stage_timing
+
+
+# HoeInLoops of the jobs in the worker process, the last ones are kept to reuse their caches
+_worker_hoe_in_loops: OrderedDict[str, HoeInLoop] = OrderedDict()
+_worker_max_hoe_in_loops: int = 4
+
+
+def _get_worker_hoe_in_loop(job_key: str, hoe_in_loop_data: bytes) -> HoeInLoop:
+    cached = _worker_hoe_in_loops.get(job_key)
+    if cached is not None:
+        _worker_hoe_in_loops.move_to_end(job_key)
+        return cached
+    hoe_in_loop = pickle.loads(hoe_in_loop_data)
+    _worker_hoe_in_loops[job_key] = hoe_in_loop
+    while len(_worker_hoe_in_loops) > _worker_max_hoe_in_loops:
+        _worker_hoe_in_loops.popitem(last=False)
+    return hoe_in_loop
+
+
+def _compute_values(job_key: Optional[str], hoe_in_loop_data: bytes, values: list, trace_stages: Optional[bool]) -> tuple:
+    """
+    Computes the values one after another in a worker process. With a `job_key`, the pickled 
+    `HoeInLoop` is only loaded by the first task of the job in this worker. Without, it is
+    loaded and not kept, e.g. for sequential sweeps, which send their state with every task.
+
+    Returns the results (or exceptions) of the values, the stage statistics and for sequential
+    sweeps the `HoeInLoop` with its new state (None, if the initialization failed).
+    """
+    if job_key is None:
+        hoe_in_loop = pickle.loads(hoe_in_loop_data)
+    else:
+        hoe_in_loop = _get_worker_hoe_in_loop(job_key, hoe_in_loop_data)
+    timer = StageTimer(bool(trace_stages))
+    results = list()
+    with collect_stage_timing(timer if trace_stages is not None else None):
+        try:
+            hoe_in_loop.initialize_calculation()
+        except Exception as e:
+            return [(None, e) for _ in values], None, None
+        for value in values:
+            try:
+                results.append((hoe_in_loop.get_Rs_Rp_Ts_Tp(value), None))
+            except Exception as e:
+                results.append((None, e))
+    stages = timer.to_dict() if trace_stages is not None else None
+    state = None if hoe_in_loop.is_parallelizable else hoe_in_loop
+    return results, stages, state
+
+
+class JobScheduler:
+    """
+    Central scheduler of the sweeps of all sessions.
+
+    Jobs are queued per session and started round-robin across the sessions, at most
+    `max_running_jobs` at a time. The solver work of the running jobs is computed in one shared
+    pool of `max_workers` processes, so the web-serving process only collects the results.
+    Every running job keeps at most `max_workers` chunks of values in the pool, so the workers
+    are shared between the running jobs. The worker processes are started with "spawn", they do
+    not inherit the locks of the threads of the web server.
+    """
+
+    def __init__(self, max_workers: int = None, max_running_jobs: int = None, max_chunk_size: int = 8):
+        """
+        Args:
+            max_workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+            max_running_jobs (int, optional): Number of jobs that run at the same time.
+                Defaults to `max_workers`.
+            max_chunk_size (int, optional): Maximum number of values per task. Smaller chunks
+                give more frequent results, larger chunks less overhead. Defaults to 8.
+        """
+        self.max_workers: int = max_workers if max_workers is not None else (os.cpu_count() or 1)
+        self.max_running_jobs: int = max_running_jobs if max_running_jobs is not None else self.max_workers
+        self.max_chunk_size: int = max_chunk_size
+        self.logger: logging.Logger = logging.getLogger("Hologram_scheduler_logger")
+        self._condition: Condition = Condition()
+        self._queues: OrderedDict[Hashable, deque[Callable]] = OrderedDict()
+        self._running: dict[Hashable, int] = dict()
+        self._pool: ProcessPoolExecutor = None
+
+    def submit(self, session: Hashable, job: Callable[[], None]) -> None:
+        """
+        Queues `job` of `session`. The job is called in a thread of the scheduler.
+        """
+        with self._condition:
+            self._queues.setdefault(session, deque()).append(job)
+            self._dispatch()
+
+    def cancel(self, session: Hashable) -> bool:
+        """
+        Removes the queued jobs of `session`. Running jobs are not affected.
+
+        Returns:
+            bool: True, if a queued job was removed.
+        """
+        with self._condition:
+            queue = self._queues.pop(session, None)
+            return (queue is not None) and (len(queue) != 0)
+
+    def is_active(self, session: Hashable) -> bool:
+        """
+        True, if a job of `session` is queued or running.
+        """
+        with self._condition:
+            return (self._running.get(session, 0) != 0) or (len(self._queues.get(session, ())) != 0)
+
+    def get_queue_position(self, session: Hashable) -> Optional[int]:
+        """
+        Position of the next job of `session` in the queue (1 is started next), 0 if a job is
+        running and no job is queued, None without jobs.
+        """
+        with self._condition:
+            for position, (waiting_session, _) in enumerate(self._get_waiting_order()):
+                if waiting_session == session:
+                    return position + 1
+            if self._running.get(session, 0) != 0:
+                return 0
+            return None
+
+    def map_values(self, hoe_in_loop: HoeInLoop, values: np.ndarray, stop_event: Event, stage_timer: Optional[StageTimer] = None) -> Iterator[tuple]:
+        """
+        Computes independent values in the worker processes, like `SweepExecutor.run`.
+
+        Yields:
+        -------
+        tuple[int, float, tuple[np.ndarray], Exception]
+            Index and value, (Rs, Rp, Ts, Tp) or None and the exception or None, in completion order.
+            The iteration ends early, if `stop_event` is set.
+        """
+        job_key = str(uuid.uuid4())
+        hoe_in_loop_data = pickle.dumps(hoe_in_loop)
+        trace_stages = None if stage_timer is None else stage_timer.trace_memory
+        # at least 4 chunks per worker, so the workers stay busy until the end
+        chunk_size = min(self.max_chunk_size, max(1, math.ceil(len(values)/(4*self.max_workers))))
+        pending = deque(range(start, min(start+chunk_size, len(values))) for start in range(0, len(values), chunk_size))
+        futures: dict[Future, range] = dict()
+        try:
+            while (len(pending) != 0) or (len(futures) != 0):
+                while (len(pending) != 0) and (len(futures) < self.max_workers):
+                    indices = pending.popleft()
+                    chunk = [values[i] for i in indices]
+                    futures[self._submit_task(job_key, hoe_in_loop_data, chunk, trace_stages)] = indices
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    indices = futures.pop(future)
+                    if stop_event.is_set():
+                        return
+                    try:
+                        results, stages, _ = future.result()
+                    except Exception as e:
+                        for i in indices:
+                            yield i, values[i], None, e
+                        continue
+                    if stages is not None:
+                        stage_timer.merge(stages)
+                    for i, (result, e) in zip(indices, results):
+                        yield i, values[i], result, e
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def run_sequential(self, hoe_in_loop: HoeInLoop, values: np.ndarray, stop_event: Event, stage_timer: Optional[StageTimer] = None) -> Iterator[tuple]:
+        """
+        Computes dependent values (e.g. the cycle thickness calculation) in order in the worker processes.
+        The values are sent in chunks of `max_chunk_size`, the state of `hoe_in_loop` is passed from 
+        chunk to chunk. The first chunk initializes the calculation (`HoeInLoop.initialize_calculation`).
+        Yields the same tuples as `map_values`. The iteration ends after a chunk that failed
+        completely, e.g. by the initialization, the following values depend on it.
+        """
+        trace_stages = None if stage_timer is None else stage_timer.trace_memory
+        chunk_size = self.max_chunk_size
+        for start in range(0, len(values), chunk_size):
+            if stop_event.is_set():
+                return
+            chunk = list(values[start:start+chunk_size])
+            # the state is sent with every chunk, so it is not kept in the workers
+            future = self._submit_task(None, pickle.dumps(hoe_in_loop), chunk, trace_stages)
+            try:
+                results, stages, hoe_in_loop = future.result()
+            except Exception as e:
+                for i, value in enumerate(chunk):
+                    yield start+i, value, None, e
+                return
+            if stages is not None:
+                stage_timer.merge(stages)
+            for i, (value, (result, e)) in enumerate(zip(chunk, results)):
+                yield start+i, value, result, e
+            if hoe_in_loop is None:
+                return
+
+    def shutdown(self) -> None:
+        with self._condition:
+            self._queues = OrderedDict()
+            pool = self._pool
+            self._pool = None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _submit_task(self, job_key: Optional[str], hoe_in_loop_data: bytes, values: list, trace_stages: Optional[bool]) -> Future:
+        with self._condition:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            pool = self._pool
+        return pool.submit(_compute_values, job_key, hoe_in_loop_data, values, trace_stages)
+
+    def _get_waiting_order(self) -> list[tuple]:
+        """
+        Queued jobs in the order they are started: one job per session and round,
+        sessions without a running job first.
+        """
+        queues = [(session, list(queue)) for session, queue in self._queues.items() if len(queue) != 0]
+        queues.sort(key=lambda item: self._running.get(item[0], 0) != 0)
+        order = list()
+        round = 0
+        while any(round < len(queue) for _, queue in queues):
+            for session, queue in queues:
+                if round < len(queue):
+                    order.append((session, queue[round]))
+            round += 1
+        return order
+
+    def _dispatch(self) -> None:
+        # called with the lock
+        while sum(self._running.values()) < self.max_running_jobs:
+            order = self._get_waiting_order()
+            if len(order) == 0:
+                return
+            session, job = order[0]
+            self._queues[session].popleft()
+            # the session goes to the end of the round-robin
+            self._queues.move_to_end(session)
+            if len(self._queues[session]) == 0:
+                del self._queues[session]
+            self._running[session] = self._running.get(session, 0) + 1
+            Thread(target=self._run_job, args=(session, job), daemon=True).start()
+
+    def _run_job(self, session: Hashable, job: Callable[[], None]) -> None:
+        try:
+            job()
+        except Exception as e:
+            self.logger.error(f"Job failed: {type(e).__name__} - {e}")
+        finally:
+            with self._condition:
+                self._running[session] -= 1
+                if self._running[session] == 0:
+                    del self._running[session]
+                self._dispatch()
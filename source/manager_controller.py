@@ -1,11 +1,18 @@
 from source.app_controller import AppController
+from source.job_scheduler import JobScheduler
+from source.result_cache import ResultCache
 from threading import Lock, Thread
 import datetime
 from time import sleep
 
 class MangerController:
 
-    def __init__(self):
+    def __init__(self, log_stage_timing: bool = False, max_workers: int = None, max_running_jobs: int = None):
+        self.log_stage_timing: bool = log_stage_timing
+        # the simulations of all sessions are queued and computed in the worker processes of the scheduler
+        self.scheduler: JobScheduler = JobScheduler(max_workers, max_running_jobs)
+        # results of all sessions, kept on the disk after a session expired
+        self.result_cache: ResultCache = ResultCache()
         self.controllers: dict[str, AppController] = dict()
         self._lock: Lock = Lock()
         self._times: dict[str, datetime.datetime] = dict()
@@ -23,7 +30,7 @@ class MangerController:
             return controller
 
     def create_controller(self, id: str):
-        self.controllers[id] = AppController()
+        self.controllers[id] = AppController(log_stage_timing=self.log_stage_timing, scheduler=self.scheduler, result_cache=self.result_cache)
         self._times[id] = datetime.datetime.now()
     
     def _start_loop(self):        
@@ -41,6 +48,7 @@ class MangerController:
                     if dt > self.max_sleep:
                         keys_del.append(key)
                 for key in keys_del:
+                    self.controllers[key].close()
                     del self.controllers[key]
                     del self._times[key]
             sleep(self._wait_for_check)
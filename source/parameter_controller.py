@@ -50,6 +50,25 @@ class ParameterControl:
     def get_current_variable_values(self) -> any:
         return self.hoe_parameters[self.current_variable].get_variable_values()
 
+    @property
+    def adaptive_tolerance(self) -> float:
+        """
+        Tolerance of the adaptive sweep in percentage points of the efficiencies, 0 for a uniform sweep.
+        """
+        return self.hoe_parameters["adaptive_tolerance"].value
+
+    @property
+    def adaptive_max_points(self) -> int:
+        return self.hoe_parameters["adaptive_max_points"].value
+
+    @property
+    def is_adaptive(self) -> bool:
+        """
+        The adaptive sweep starts with the uniform grid of the variable as coarse grid.
+        Not possible for the cycle thickness calculation.
+        """
+        return (self.adaptive_tolerance > 0) and (self.current_variable != "cycles_thickness")
+
     def get_parameter_by_name(self, name) -> Parameter:
         return self.hoe_parameters[name]
 
@@ -0,0 +1,136 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+import numpy as np
+import hashlib
+import os
+
+
+# Part of every key. Increase it, if the results of the solver or the file format change,
+# so results of older versions are not used anymore.
+RESULT_CACHE_VERSION: int = 1
+
+
+def get_default_cache_directory() -> str:
+    """
+    Cache directory of the current user: %LOCALAPPDATA% on Windows, $XDG_CACHE_HOME or ~/.cache otherwise.
+    """
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), "AppData", "Local")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "hoe_result_cache")
+
+
+class ResultCache:
+    """
+    Cache of the computed (Rs, Rp, Ts, Tp) of single sweep values on the local disk.
+
+    The entries are addressed by a hash of all parameters of the hologram and the sweep value
+    (see `HoeInLoop.get_cache_key`), so they are shared by all sessions and by later runs of
+    the app of the same user. Each entry is one .npy file in `directory`, which is only accessible
+    by the user. If the files exceed `max_bytes`, the least recently used entries are removed, 
+    the time of use is the modification time of the file.
+    """
+
+    def __init__(self, directory: str = None, max_bytes: int = 256*1024**2):
+        """
+        Args:
+            directory (str, optional): Directory of the cache files. Defaults to 
+                `get_default_cache_directory()`.
+            max_bytes (int, optional): Maximum size of the cache files. Defaults to 256 MB.
+        """
+        self.directory: str = directory if directory is not None else get_default_cache_directory()
+        self.max_bytes: int = max_bytes
+        self._lock: Lock = Lock()
+        self._sizes: OrderedDict[str, int] = OrderedDict()
+        self._total_bytes: int = 0
+
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        # makedirs does not change the mode of an existing directory
+        os.chmod(self.directory, 0o700)
+        self._load_index()
+
+    @staticmethod
+    def create_key(*values) -> str:
+        """
+        Hash of the values and `RESULT_CACHE_VERSION`, the representation of the values must be unique.
+        """
+        return hashlib.sha256(repr((RESULT_CACHE_VERSION, values)).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[tuple[np.ndarray]]:
+        """
+        (Rs, Rp, Ts, Tp) of `key` or None, if it is not cached.
+        """
+        path = self._get_path(key)
+        with self._lock:
+            try:
+                values = np.load(path)
+                os.utime(path)
+            except (OSError, ValueError):
+                # not cached, removed by another process or incomplete
+                self._remove_from_index(key)
+                return None
+            if key not in self._sizes:
+                # written by another process
+                self._add_to_index(key, os.path.getsize(path))
+            self._sizes.move_to_end(key)
+        Rs, Rp, Ts, Tp = values
+        return Rs, Rp, Ts, Tp
+
+    def put(self, key: str, Rs: np.ndarray, Rp: np.ndarray, Ts: np.ndarray, Tp: np.ndarray) -> None:
+        path = self._get_path(key)
+        with self._lock:
+            temporary_path = path + f".{os.getpid()}.tmp"
+            try:
+                with open(temporary_path, "wb") as file:
+                    np.save(file, np.stack((Rs, Rp, Ts, Tp)))
+                os.replace(temporary_path, path)
+            except OSError:
+                return
+            self._remove_from_index(key)
+            self._add_to_index(key, os.path.getsize(path))
+            self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._sizes.keys()):
+                self._remove_file(key)
+            self._sizes = OrderedDict()
+            self._total_bytes = 0
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".npy")
+
+    def _load_index(self) -> None:
+        entries = list()
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".npy"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._add_to_index(key, size)
+        with self._lock:
+            self._evict()
+
+    def _add_to_index(self, key: str, size: int) -> None:
+        self._sizes[key] = size
+        self._total_bytes += size
+
+    def _remove_from_index(self, key: str) -> None:
+        size = self._sizes.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self) -> None:
+        # called with the lock, the first entries are the least recently used
+        while (self._total_bytes > self.max_bytes) and (len(self._sizes) != 0):
+            key, size = self._sizes.popitem(last=False)
+            self._total_bytes -= size
+            self._remove_file(key)
+
+    def _remove_file(self, key: str) -> None:
+        try:
+            os.remove(self._get_path(key))
+        except OSError:
+            pass
@@ -1,5 +1,15 @@
 from source.data_container import DataContainer
 from threading import Lock
+import tempfile
+import weakref
+import logging
+import shutil
+
+
+def _remove_directory(directory: str) -> None:
+    def log_error(function, path, exc_info):
+        logging.getLogger("Hologram_app_logger").warning(f"Can't remove {path}: {exc_info[1]}")
+    shutil.rmtree(directory, onerror=log_error)
 
 class StoreController:
     """
@@ -9,16 +19,36 @@ class StoreController:
     It provides thread-safe access to simulation data, allowing for concurrent 
     operations while ensuring data consistency.
 
+    With `use_disk`, the Rs/Rp/Ts/Tp values of the stored simulations are written to a 
+    temporary directory and kept as read-only memory maps. Plotting reads only the 
+    requested orders, so the memory does not grow with the number and size of the simulations.
+    The memory maps are closed before their files are removed. The directory is removed by 
+    `close` or when the controller is garbage collected, failures are logged.
+
     """
 
-    def __init__(self):
+    def __init__(self, use_disk: bool = True):
         self.simulations: dict[str, DataContainer] = dict()
         self.new_data = False
         self.selected_simulation = list()
         self._lock_data:Lock = Lock()
+        self._plot_cache: list[dict] = list()
+        self._plot_cache_key: tuple = None
+
+        self.use_disk: bool = use_disk
+        self._directory: str = None
+        self._simulation_directories: dict[str, str] = dict()
+        if use_disk:
+            self._directory = tempfile.mkdtemp(prefix="hoe_store_")
+            self._finalizer = weakref.finalize(self, _remove_directory, self._directory)
 
     def add_simulation(self, name: str,data: DataContainer) -> None:
         with self._lock_data:
+            if self.use_disk:
+                directory = tempfile.mkdtemp(dir=self._directory)
+                data = data.to_memory_map(directory)
+                self._remove_simulation(name)
+                self._simulation_directories[name] = directory
             self.simulations[name] = data
             self.new_data = True
 
@@ -30,12 +60,21 @@ class StoreController:
             return data
 
     def get_plot_data(self, add_Rs:bool, add_Rp:bool, add_Ts:bool, add_Tp:bool, add_es:bool, add_ep:bool ,hx: int, hy: int) -> list[dict]:
+        """
+        Traces of the selected simulations. They are cached until the selection, the 
+        checkboxes or the order change or `new_data` is set.
+        """
         with self._lock_data:
-            plot_data_all = list()
-            for key in self.selected_simulation:
-                plot_data = self.simulations[key].get_plot_data(add_Rs, add_Rp, add_Ts, add_Tp, add_es, add_ep, hx, hy)
-                plot_data_all = plot_data_all + plot_data
-            return plot_data_all
+            key = (add_Rs, add_Rp, add_Ts, add_Tp, add_es, add_ep, hx, hy, tuple(self.selected_simulation))
+            if self.new_data or (key != self._plot_cache_key):
+                plot_data_all = list()
+                for name in self.selected_simulation:
+                    plot_data = self.simulations[name].get_plot_data(add_Rs, add_Rp, add_Ts, add_Tp, add_es, add_ep, hx, hy)
+                    plot_data_all = plot_data_all + plot_data
+                self._plot_cache = plot_data_all
+                self._plot_cache_key = key
+            # the callers modify the dicts
+            return [dict(plot) for plot in self._plot_cache]
             
     def get_json_data(self) -> dict[str]:
         with self._lock_data:
@@ -44,10 +83,42 @@ class StoreController:
                 json_data[key]=(self.simulations[key].to_json())
             return json_data
 
+    def get_npz_data(self) -> dict[str, bytes]:
+        with self._lock_data:
+            npz_data = dict()
+            for key in self.simulations.keys():
+                npz_data[key] = self.simulations[key].to_npz()
+            return npz_data
+
     def delete_selected(self) -> None:
         with self._lock_data:
             for key in self.selected_simulation:
-                del self.simulations[key]
+                self._remove_simulation(key)
             self.selected_simulation = list()
             self.new_data = True
 
+    def close(self) -> None:
+        """
+        Removes all simulations and the files of the memory maps.
+        """
+        with self._lock_data:
+            for name in list(self.simulations.keys()):
+                self._remove_simulation(name)
+            self.selected_simulation = list()
+            if self.use_disk:
+                self._finalizer()
+
+    def _remove_simulation(self, name: str) -> None:
+        """
+        Removes the simulation and the files of its memory maps.
+        """
+        # the cached traces are views of the memory maps
+        self._plot_cache = list()
+        self._plot_cache_key = None
+        data = self.simulations.pop(name, None)
+        if data is not None:
+            data.close_memory_maps()
+        directory = self._simulation_directories.pop(name, None)
+        if directory is not None:
+            _remove_directory(directory)
+
@@ -0,0 +1,78 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from threading import Event
+from typing import Iterator, Optional
+import numpy as np
+import multiprocessing
+
+from source.hoe_in_loop import HoeInLoop
+from rcwa.stage_timing import StageTimer, collect_stage_timing
+
+
+# HoeInLoop of the worker process, set by the pool initializer
+_worker_hoe_in_loop: HoeInLoop = None
+
+
+def _initialize_worker(hoe_in_loop: HoeInLoop) -> None:
+    global _worker_hoe_in_loop
+    _worker_hoe_in_loop = hoe_in_loop
+
+
+def _compute_sweep_point(i: int, value: float, trace_stages: Optional[bool] = None) -> tuple:
+    if trace_stages is None:
+        Rs, Rp, Ts, Tp = _worker_hoe_in_loop.get_Rs_Rp_Ts_Tp(value)
+        return i, Rs, Rp, Ts, Tp, None
+    with collect_stage_timing(trace_memory=trace_stages) as timer:
+        Rs, Rp, Ts, Tp = _worker_hoe_in_loop.get_Rs_Rp_Ts_Tp(value)
+    return i, Rs, Rp, Ts, Tp, timer.to_dict()
+
+
+class SweepExecutor:
+    """
+    Evaluates independent sweep values of a `HoeInLoop` in a pool of processes.
+
+    Each worker process receives a copy of the prepared `HoeInLoop` once. The sweep values 
+    are distributed over the workers and the results are returned in completion order.
+    Only sweeps with independent points can be executed, see `HoeInLoop.is_parallelizable`.
+    With a `stage_timer`, the solver stages of the workers are recorded and added to it.
+
+    This is the pool of one sweep without a GUI, used by `BatchRunner`. The app computes the 
+    sweeps of all sessions in the pool of the `JobScheduler`.
+    The workers are started with "spawn", they do not inherit the locks of other threads.
+    """
+
+    def __init__(self, hoe_in_loop: HoeInLoop, max_workers: int, stage_timer: Optional[StageTimer] = None):
+        self.hoe_in_loop: HoeInLoop = hoe_in_loop
+        self.max_workers: int = max_workers
+        self.stage_timer: Optional[StageTimer] = stage_timer
+
+    def run(self, variable: np.ndarray, stop_event: Event) -> Iterator[tuple]:
+        """
+        Computes all values of `variable`.
+
+        Yields:
+        -------
+        tuple[int, float, tuple[np.ndarray], Exception]
+            Index and value of the sweep point, (Rs, Rp, Ts, Tp) or None and the 
+            exception of a failed point or None.
+            The iteration ends early, if `stop_event` is set. Pending points are cancelled.
+        """
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context, initializer=_initialize_worker, initargs=(self.hoe_in_loop,)) as pool:
+            trace_stages = None if self.stage_timer is None else self.stage_timer.trace_memory
+            futures = dict()
+            for i, value in enumerate(variable):
+                futures[pool.submit(_compute_sweep_point, i, value, trace_stages)] = (i, value)
+
+            for future in as_completed(futures):
+                if stop_event.is_set():
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    return
+                i, value = futures[future]
+                try:
+                    _, Rs, Rp, Ts, Tp, stages = future.result()
+                except Exception as e:
+                    yield i, value, None, e
+                else:
+                    if stages is not None:
+                        self.stage_timer.merge(stages)
+                    yield i, value, (Rs, Rp, Ts, Tp), None
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from numpy.fft import fft2, fftshift
+
+from rcwa.parameter import Parameter
+from rcwa.calculator_scatter_matrix import build_convolution_matrices, _ScatterMatrixSystemData
+
+
+def _build_convolution_matrix_per_row(spectrum: np.ndarray, system_data: _ScatterMatrixSystemData) -> np.ndarray:
+    """
+    Reference: the per-row construction of the convolution matrix before the vectorized gather.
+    """
+    pram = system_data.pram
+    my = int((spectrum.shape[0]-1)/2)
+    mx = int((spectrum.shape[1]-1)/2)
+    ps = system_data.grid_p.flatten()
+    qs = system_data.grid_q.flatten()
+    total = len(ps)
+    convolution_matrix = np.zeros((total, total), dtype=pram.dtype)
+    for n in range(total):
+        sy = int(my + qs[n] - pram.harmonic_order_y)
+        sx = int(mx + ps[n] - pram.harmonic_order_x)
+        ey = int(my + qs[n] + pram.harmonic_order_y+1)
+        ex = int(mx + ps[n] + pram.harmonic_order_x+1)
+        convolution_matrix[n, :] = spectrum[sy:ey, sx:ex].flatten()[::-1]
+    return convolution_matrix
+
+
+def _create_system_data(harmonic_order_x: int, harmonic_order_y: int) -> _ScatterMatrixSystemData:
+    pram = Parameter()
+    pram.harmonic_order_x = harmonic_order_x
+    pram.harmonic_order_y = harmonic_order_y
+    return _ScatterMatrixSystemData(pram)
+
+
+def _create_slices(n_layers: int, ny: int, nx: int) -> np.ndarray:
+    rng = np.random.default_rng(1)
+    return 2.0 + rng.random((n_layers, ny, nx)) + 0.1j*rng.random((n_layers, ny, nx))
+
+
+@pytest.mark.parametrize("harmonic_order_x, harmonic_order_y", [(2, 0), (3, 0), (2, 1), (3, 2)])
+@pytest.mark.parametrize("is_spectrum", [False, True])
+def test_gather_equals_per_row_construction(harmonic_order_x, harmonic_order_y, is_spectrum):
+    system_data = _create_system_data(harmonic_order_x, harmonic_order_y)
+    ny = 4*harmonic_order_y+3 if harmonic_order_y != 0 else 1
+    nx = 4*harmonic_order_x+5
+    slices = _create_slices(3, ny, nx)
+    spectra = np.stack([fftshift(fft2(e))/e.size for e in slices])
+
+    convolution_matrices = build_convolution_matrices(spectra if is_spectrum else slices, system_data, is_spectrum)
+
+    assert convolution_matrices.shape == (3, system_data.grid_p.size, system_data.grid_p.size)
+    for i in range(3):
+        expected = _build_convolution_matrix_per_row(spectra[i], system_data)
+        np.testing.assert_allclose(convolution_matrices[i], expected, rtol=0, atol=1e-14)
+
+
+@pytest.mark.parametrize("is_spectrum", [False, True])
+def test_gather_of_single_slice(is_spectrum):
+    system_data = _create_system_data(3, 1)
+    e = _create_slices(1, 7, 17)[0]
+    spectrum = fftshift(fft2(e))/e.size
+
+    convolution_matrix = build_convolution_matrices(spectrum if is_spectrum else e, system_data, is_spectrum)
+
+    expected = _build_convolution_matrix_per_row(spectrum, system_data)
+    np.testing.assert_allclose(convolution_matrix, expected, rtol=0, atol=1e-14)
@@ -0,0 +1,46 @@
+import numpy as np
+from threading import Event
+
+from source.parameter_controller import ParameterControl
+from source.hoe_in_loop import HoeInLoop
+from source.sweep_executor import SweepExecutor
+from rcwa.stage_timing import StageTimer
+
+
+def _create_hoe_in_loop() -> HoeInLoop:
+    parameter_control = ParameterControl()
+    parameter_control.current_variable = "theta"
+    parameter_control.set_variable_range("theta", -5, 5, 6)
+    parameter_control.hoe_parameters["n_z"].value = 11
+    parameter_control.hoe_parameters["harmonic_order"].value = 1
+    hoe_in_loop = HoeInLoop(parameter_control)
+    hoe_in_loop.get_start_value_container()
+    return hoe_in_loop
+
+
+def test_results_equal_serial_sweep():
+    hoe_in_loop = _create_hoe_in_loop()
+    variable = hoe_in_loop.parameter_control.get_current_variable_values()
+    timer = StageTimer()
+    executor = SweepExecutor(hoe_in_loop, 2, timer)
+
+    results = {i: (value, result, e) for i, value, result, e in executor.run(variable, Event())}
+
+    assert sorted(results.keys()) == list(range(len(variable)))
+    for i, (value, result, e) in results.items():
+        assert e is None
+        assert value == variable[i]
+        expected = hoe_in_loop.get_Rs_Rp_Ts_Tp(value)
+        for computed, reference in zip(result, expected):
+            np.testing.assert_allclose(computed, reference, rtol=0, atol=1e-12)
+    assert timer.stages["calc_rcwa"].calls == len(variable)
+
+
+def test_stop_event_ends_sweep():
+    hoe_in_loop = _create_hoe_in_loop()
+    variable = hoe_in_loop.parameter_control.get_current_variable_values()
+    stop_event = Event()
+    stop_event.set()
+    executor = SweepExecutor(hoe_in_loop, 2)
+
+    assert list(executor.run(variable, stop_event)) == []